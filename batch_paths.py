@@ -0,0 +1,77 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from local_optimization import ARRAY_ENGINES, DEFAULT_ENGINE, ShortestPathTree, reconstruct_path
+from worker_pool import graph_process_pool, worker_graph
+
+
+# Один пошук від source і результати для всіх його цілей
+def _search_source(graph, source, targets, engine=DEFAULT_ENGINE):
+    dist, pred = ARRAY_ENGINES[engine](graph, graph.index_of[source])
+    tree = ShortestPathTree(graph, source, dist, pred)
+    results = []
+    for index, target in targets:
+        if target not in graph:
+            results.append({"index": index, "source": source, "target": target, "value": None, "path": []})
+            continue
+        value = tree.value(target)
+        reachable = value != float('inf')
+        results.append({
+            "index": index,
+            "source": source,
+            "target": target,
+            "value": round(value, 2) if reachable else None,
+            "path": reconstruct_path(graph, tree, source, target) if reachable else [],
+        })
+    return results
+
+
+def _search_source_in_worker(source, targets, engine):
+    return _search_source(worker_graph(), source, targets, engine)
+
+
+def batch_shortest_paths(graph, pairs, max_workers=None, engine=DEFAULT_ENGINE, executor=None):
+    """
+    Обчислює шляхи для багатьох пар (source, target): пари групуються за source, і для кожного
+    окремого source виконується лише один пошук, за потреби - у пулі процесів.
+
+    Args:
+        graph (CSRGraph): Граф асоціацій.
+        pairs (list): Пари ID вершин (source, target).
+        max_workers (int): Кількість процесів; 1 - обчислення в поточному процесі.
+        engine (str): Рушій оптимізації з ARRAY_ENGINES.
+        executor (ProcessPoolExecutor): Спільний пул процесів з графом graph (graph_process_pool);
+            якщо задано, новий пул не створюється, а max_workers не використовується.
+
+    Yields:
+        dict: Результат для пари з полями index (позиція у pairs), source, target, value
+        (None, якщо шляху немає) та path у форматі reconstruct_path. Результати надходять
+        у порядку завершення пошуків, а не в порядку pairs.
+    """
+    groups = OrderedDict()
+    for index, (source, target) in enumerate(pairs):
+        if source not in graph:
+            yield {"index": index, "source": source, "target": target, "value": None, "path": []}
+            continue
+        groups.setdefault(source, []).append((index, target))
+
+    if max_workers is None:
+        max_workers = min(len(groups), os.cpu_count() or 1)
+    if len(groups) <= 1 or (executor is None and max_workers <= 1):
+        for source, targets in groups.items():
+            yield from _search_source(graph, source, targets, engine)
+        return
+
+    if executor is not None:
+        yield from _search_in_pool(executor, groups, engine)
+        return
+    with graph_process_pool(graph, max_workers) as executor:
+        yield from _search_in_pool(executor, groups, engine)
+
+
+# Пошуки від усіх source у пулі процесів; результати - у порядку завершення
+def _search_in_pool(executor, groups, engine):
+    futures = [executor.submit(_search_source_in_worker, source, targets, engine)
+               for source, targets in groups.items()]
+    for future in as_completed(futures):
+        yield from future.result()
@@ -0,0 +1,217 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from local_optimization import (read_graph_from_csv, initialize_graph, local_optimize_graph, reconstruct_path,
+                                ARRAY_ENGINES)
+from opt_path_to_json import opt_path_to_json
+from create_subgraph import create_subgraph_based_on_degree, ego_subgraph, weight_threshold_subgraph
+from graph_core import NODES_FILE
+
+
+EDGES_FILE = 'csvs/cue1_response2_str_filtered_ROOT.csv'
+BASELINE_FILE = 'benchmarks/baseline.json'
+# Допустиме сповільнення відносно базових вимірів, після якого результат вважається регресією
+DEFAULT_TOLERANCE = 0.25
+# Рушії, які на масштабованих графах працюють надто довго, щоб міряти їх за замовчуванням
+SLOW_ENGINES = ('reference',)
+
+
+# Час виконання fn: мінімум, медіана та середнє з repeat запусків (у секундах)
+def time_call(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings), "mean": statistics.fmean(timings),
+            "repeat": repeat}
+
+
+def synthetic_edges(df, scale, seed=0):
+    """
+    Масштабований синтетичний набір дуг: scale копій реального графа зі зсунутими ID, у яких
+    10% дуг кожної копії переспрямовано в наступну копію, щоб граф лишався зв'язним.
+
+    Args:
+        df (pd.DataFrame): Дуги реального графа у форматі CSV.
+        scale (int): Кількість копій (у стільки ж разів більше вершин і дуг).
+        seed (int): Зерно генератора випадкових чисел.
+
+    Returns:
+        pd.DataFrame: Дуги у форматі CSV.
+    """
+    if scale == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    offset = int(max(df['Source'].max(), df['Target'].max())) + 1
+    copies = []
+    for k in range(scale):
+        copy = df.copy()
+        copy['Source'] = df['Source'] + k * offset
+        rewired = rng.random(len(df)) < 0.1
+        copy['Target'] = df['Target'] + np.where(rewired, (k + 1) % scale, k) * offset
+        copy['SourceWord'] = df['SourceWord'].astype(str) + f'_{k}'
+        copy['TargetWord'] = df['TargetWord'].astype(str) + f'_{k}'
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+# Порівняння масивів міток двох рушіїв (inf у тих самих вершинах, решта - з точністю до округлення)
+def same_labels(dist, other):
+    return bool(np.array_equal(np.isinf(dist), np.isinf(other)) and
+                np.allclose(dist[np.isfinite(dist)], other[np.isfinite(other)], rtol=1e-9, atol=1e-9))
+
+
+def benchmark_graph(name, df, starts, engines, repeat, nodes_file=None, with_json=False):
+    results = {}
+    correctness = {}
+
+    if nodes_file is not None:
+        results[f"{name}/load"] = time_call(lambda: initialize_graph(read_graph_from_csv(EDGES_FILE), nodes_file),
+                                            repeat)
+    else:
+        results[f"{name}/load"] = time_call(lambda: initialize_graph(df, None), repeat)
+    G = initialize_graph(df, nodes_file)
+    results[f"{name}/load"].update(nodes=G.number_of_nodes(), edges=G.number_of_edges())
+
+    # Початкові вершини вибираються серед тих, що мають вихідні дуги
+    rng = random.Random(0)
+    candidates = G.ids[np.diff(G.indptr) > 0].tolist()
+    sample = rng.sample(candidates, min(starts, len(candidates)))
+    trees = {}
+    for engine in engines:
+        results[f"{name}/local_optimize_graph/{engine}"] = time_call(
+            lambda: [local_optimize_graph(G, node, engine=engine) for node in sample], repeat)
+        trees[engine] = [local_optimize_graph(G, node, engine=engine)[1] for node in sample]
+        results[f"{name}/local_optimize_graph/{engine}"]["starts"] = len(sample)
+
+    # Мітки кожного рушія мають збігатися з мітками першого
+    reference_engine = engines[0]
+    for engine in engines[1:]:
+        correctness[f"{name}/{engine}=={reference_engine}"] = all(
+            same_labels(tree.dist, base.dist) for tree, base in zip(trees[engine], trees[reference_engine]))
+
+    # Шляхи відновлюються з дерева вершини, з якої досяжно найбільше вершин
+    tree = max(trees[reference_engine], key=lambda tree: np.isfinite(tree.dist).sum())
+    reachable = G.ids[np.isfinite(tree.dist)].tolist()
+    targets = rng.sample(reachable, min(50, len(reachable)))
+    results[f"{name}/reconstruct_path"] = time_call(
+        lambda: [reconstruct_path(G, tree, tree.start_node, target) for target in targets], repeat)
+    results[f"{name}/reconstruct_path"]["paths"] = len(targets)
+    if with_json:
+        paths = [reconstruct_path(G, tree, tree.start_node, target) for target in targets]
+        results[f"{name}/opt_path_to_json"] = time_call(
+            lambda: [opt_path_to_json(path, json_file_path=None, graph=G) for path in paths], repeat)
+    results[f"{name}/create_subgraph_based_on_degree"] = time_call(lambda: create_subgraph_based_on_degree(G, 25),
+                                                                   repeat)
+    results[f"{name}/ego_subgraph"] = time_call(lambda: ego_subgraph(G, sample[0], 2, 500), repeat)
+    results[f"{name}/weight_threshold_subgraph"] = time_call(
+        lambda: weight_threshold_subgraph(G, float(np.median(G.weight)), 500), repeat)
+    return results, correctness
+
+
+def benchmark_endpoints(repeat):
+    import web_app
+    client = web_app.app.test_client()
+    sub_words = [name for name in web_app.subgraph.names.tolist() if name is not None]
+    requests = {
+        "optimize_graph": lambda: client.post('/optimize_graph', data={'word1': 'дім', 'word2': 'мама'}),
+        "optimize_graph_mapping": lambda: client.post('/optimize_graph',
+                                                      data={'word1': 'дім', 'word2': 'мама', 'mapping': '1'}),
+        "optimize_new_second_word": lambda: client.post('/optimize_new_second_word', data={'newSecondWord': 'тато'}),
+        "optimize_subgraph": lambda: client.post('/optimize_subgraph',
+                                                 data={'word1': sub_words[0], 'word2': sub_words[1]}),
+        "batch_paths": lambda: client.post('/batch_paths', json={'pairs': [['дім', 'мама'], ['кіт', 'собака']]}),
+        "download_mapping_zip": lambda: client.post('/download_mapping_zip', data={'format': 'csv'}).get_data(),
+    }
+    return {f"endpoints/{name}": time_call(request, repeat) for name, request in requests.items()}
+
+
+# Результати, медіана яких перевищує базову більш ніж на tolerance
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for name, timing in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        if timing["median"] > base["median"] * (1 + tolerance):
+            regressions.append({"name": name, "median": timing["median"], "baseline": base["median"],
+                                "ratio": timing["median"] / base["median"]})
+    return regressions
+
+
+def run(scales=(1,), starts=20, repeat=3, engines=None, endpoints=True):
+    engines = list(engines or ARRAY_ENGINES)
+    df = read_graph_from_csv(EDGES_FILE)
+    results, correctness = {}, {}
+    # Службовий вивід функцій оптимізації не потрапляє у JSON-звіт
+    with contextlib.redirect_stdout(io.StringIO()):
+        for scale in scales:
+            scale_engines = engines if scale == 1 else [engine for engine in engines if engine not in SLOW_ENGINES]
+            graph_results, graph_correctness = benchmark_graph(
+                f"x{scale}", synthetic_edges(df, scale), starts, scale_engines, repeat,
+                nodes_file=NODES_FILE if scale == 1 else None, with_json=scale == 1)
+            results.update(graph_results)
+            correctness.update(graph_correctness)
+        if endpoints:
+            results.update(benchmark_endpoints(repeat))
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scales": list(scales),
+            "starts": starts,
+            "repeat": repeat,
+        },
+        "results": results,
+        "correctness": correctness,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the optimizer, loaders and endpoints.")
+    parser.add_argument('--scales', default='1,10,100', help="Edge multipliers of synthetic graphs, e.g. 1,10,100")
+    parser.add_argument('--starts', type=int, default=20, help="Number of sampled start words")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engines', default=None, help="Comma-separated engines (default: all)")
+    parser.add_argument('--no-endpoints', action='store_true', help="Skip Flask endpoint timings")
+    parser.add_argument('--output', default=None, help="JSON results file (default: stdout)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    report = run(scales=[int(scale) for scale in args.scales.split(',')], starts=args.starts, repeat=args.repeat,
+                 engines=args.engines.split(',') if args.engines else None, endpoints=not args.no_endpoints)
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            report["regressions"] = find_regressions(report["results"], json.load(file), args.tolerance)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+    # Ненульовий код виходу, якщо рушії розходяться або є регресії
+    if not all(report["correctness"].values()) or report.get("regressions"):
+        sys.exit(1)
@@ -1,5 +1,13 @@
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from local_optimization import read_graph_from_csv, initialize_graph, local_optimize_graph
+from graph_core import CSRGraph
+
+
+SUBGRAPH_METHODS = ('degree', 'ego', 'threshold')
+EGO_DIRECTIONS = ('both', 'out', 'in')
 
 
 # Збереження інформації про ребра підграфа у CSV файл
@@ -41,20 +49,183 @@ def save_subgraph_nodes_to_csv(graph_nodes, subgraph_nodes, output_csv_file):
     print(f"Вузли підграфа збережено до {output_csv_file}")
 
 
+# Індекси вершин за спаданням ступеня; за рівного ступеня - у порядку ID, як стабільний sorted(G.degree)
+def degree_ranking(degree):
+    return np.argsort(-degree, kind='stable')
+
+
+# Підграф, індукований вершинами з маскою keep
+def _induced_subgraph(G, keep):
+    return G.masked_subgraph(keep, keep[G.edge_sources()] & keep[G.indices])
+
+
 # Створення підграфа на основі ступеня вузлів
 def create_subgraph_based_on_degree(G, num_nodes):
-    # Сортування вузлів за ступенем у порядку спадання
-    sorted_nodes_by_degree = sorted(G.degree, key=lambda x: x[1], reverse=True)
-    top_nodes = [node for node, degree in sorted_nodes_by_degree[:num_nodes]]
-    subgraph = G.subgraph(top_nodes).copy()
-
-    # Виведення інформації про вузли та ребра підграфа
-    print("Вузли підграфа:", subgraph.nodes())
-    print("Ребра підграфа:")
-    for u, v, data in subgraph.edges(data=True):
-        print(f"{u} -> {v} з вагою {data['weight']}")
-
-    return subgraph
+    if not isinstance(G, CSRGraph):
+        # nx.DiGraph: сортування вузлів за ступенем у порядку спадання
+        sorted_nodes_by_degree = sorted(G.degree, key=lambda x: x[1], reverse=True)
+        return G.subgraph([node for node, degree in sorted_nodes_by_degree[:num_nodes]]).copy()
+
+    keep = np.zeros(G.number_of_nodes(), dtype=bool)
+    keep[degree_ranking(G.degree_array())[:num_nodes]] = True
+    return _induced_subgraph(G, keep)
+
+
+def ego_subgraph(G, center, hops=1, max_nodes=None, direction='both'):
+    """
+    Підграф околу вершини: усі вершини на відстані не більше hops дуг від center та дуги між ними.
+    Кільця околу розширюються масивними операціями над CSR (вихідні дуги) і CSC (вхідні дуги).
+
+    Args:
+        G (CSRGraph): Граф асоціацій.
+        center (int): ID центральної вершини.
+        hops (int): Кількість кроків від центральної вершини.
+        max_nodes (int): Найбільша кількість вершин; з кільця, що не вміщується повністю,
+            беруться вершини з найбільшим ступенем.
+        direction (str): 'both' - дуги в обидва боки, 'out' - лише вихідні, 'in' - лише вхідні.
+
+    Returns:
+        CSRGraph: Підграф околу.
+    """
+    if center not in G:
+        raise ValueError(f"Вершини {center} немає в графі.")
+    if direction not in EGO_DIRECTIONS:
+        raise ValueError(f"Невідомий напрямок: {direction}. Доступні: {', '.join(EGO_DIRECTIONS)}")
+    size = G.number_of_nodes()
+    sources = G.edge_sources()
+    # Позиція кожної вершини в рейтингу за ступенем
+    rank = np.empty(size, dtype=np.int64)
+    rank[degree_ranking(G.degree_array())] = np.arange(size)
+
+    keep = np.zeros(size, dtype=bool)
+    frontier = np.array([G.index_of[center]], dtype=np.int64)
+    keep[frontier] = True
+    for _ in range(hops):
+        neighbours = []
+        if direction in ('both', 'out'):
+            neighbours.append(G.indices[G.out_edge_positions(frontier)])
+        if direction in ('both', 'in'):
+            neighbours.append(sources[G.in_edge_positions(frontier)])
+        ring = np.unique(np.concatenate(neighbours))
+        ring = ring[~keep[ring]]
+        if max_nodes is not None and keep.sum() + len(ring) > max_nodes:
+            ring = ring[np.argsort(rank[ring])[:max(0, max_nodes - int(keep.sum()))]]
+            keep[ring] = True
+            break
+        if len(ring) == 0:
+            break
+        keep[ring] = True
+        frontier = ring.astype(np.int64)
+    return _induced_subgraph(G, keep)
+
+
+def weight_threshold_subgraph(G, max_weight, max_nodes=None):
+    """
+    Підграф сильних асоціацій: дуги з вагою не більше max_weight та їхні кінцеві вершини.
+
+    Args:
+        G (CSRGraph): Граф асоціацій (ваги поточної схеми).
+        max_weight (float): Найбільша вага дуги.
+        max_nodes (int): Найбільша кількість вершин; лишаються вершини з найбільшим ступенем
+            за вибраними дугами.
+
+    Returns:
+        CSRGraph: Підграф вибраних дуг.
+    """
+    sources = G.edge_sources()
+    mask = G.weight <= max_weight
+    if max_nodes is not None:
+        degree = (np.bincount(sources[mask], minlength=G.number_of_nodes()) +
+                  np.bincount(G.indices[mask], minlength=G.number_of_nodes()))
+        top = degree_ranking(degree)[:max_nodes]
+        keep = np.zeros(G.number_of_nodes(), dtype=bool)
+        keep[top[degree[top] > 0]] = True
+        mask &= keep[sources] & keep[G.indices]
+    return G.edge_subgraph(mask)
+
+
+def extract_subgraph(G, method='degree', size=25, center=None, hops=1, max_weight=None, direction='both'):
+    """
+    Підграф для демонстрації одним із методів SUBGRAPH_METHODS.
+
+    Args:
+        G (CSRGraph): Граф асоціацій.
+        method (str): 'degree' - size вершин з найбільшим ступенем; 'ego' - окіл вершини center
+            радіусом hops; 'threshold' - дуги з вагою не більше max_weight.
+        size (int): Найбільша кількість вершин підграфа.
+        center (int): ID центральної вершини (для 'ego').
+        hops (int): Радіус околу (для 'ego').
+        max_weight (float): Поріг ваги дуг (для 'threshold').
+        direction (str): Напрямок дуг околу (для 'ego').
+
+    Returns:
+        CSRGraph: Підграф.
+    """
+    if method == 'degree':
+        return create_subgraph_based_on_degree(G, size)
+    if method == 'ego':
+        if center is None:
+            raise ValueError("Для підграфа околу потрібна центральна вершина.")
+        return ego_subgraph(G, center, hops, size, direction)
+    if method == 'threshold':
+        if max_weight is None:
+            raise ValueError("Для підграфа за вагою потрібен поріг ваги.")
+        return weight_threshold_subgraph(G, max_weight, size)
+    raise ValueError(f"Невідомий метод побудови підграфа: {method}. Доступні: {', '.join(SUBGRAPH_METHODS)}")
+
+
+class SubgraphCache:
+    """
+    Кеш підграфів extract_subgraph за параметрами побудови. Разом з підграфом зберігається
+    результат make(subgraph) (наприклад, дерева найкоротших шляхів). Коли записів більше
+    за max_entries, витісняються ті, до яких найдовше не зверталися (LRU).
+    """
+
+    def __init__(self, graph, make=None, max_entries=32):
+        self.graph = graph
+        self.make = make
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, method='degree', size=25, center=None, hops=1, max_weight=None, direction='both'):
+        """
+        Returns:
+            tuple: (CSRGraph підграфа, результат make або None).
+        """
+        key = (method, int(size), center, int(hops), max_weight, direction)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            graph = self.graph
+
+        subgraph = extract_subgraph(graph, method, size, center, hops, max_weight, direction)
+        entry = (subgraph, self.make(subgraph) if self.make is not None else None)
+        with self._lock:
+            # Підграф графа, заміненого під час побудови (replace_graph), не зберігається
+            if graph is not self.graph:
+                return entry
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    # Перехід на нову версію графа: збережені підграфи скидаються і будуються заново під час запитів
+    def replace_graph(self, graph):
+        with self._lock:
+            self.graph = graph
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "max_entries": self.max_entries}
 
 
 if __name__ == "__main__":
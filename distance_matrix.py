@@ -0,0 +1,119 @@
+import json
+import os
+import sys
+import numpy as np
+from local_optimization import ARRAY_ENGINES, DEFAULT_ENGINE, path_from_pred
+from path_cache import compact_index_dtype
+from graph_snapshot import load_graph, source_fingerprint, atomic_replace_dir, EDGES_FILE
+from worker_pool import graph_process_pool, worker_graph
+from graph_core import NODES_FILE
+
+
+MATRIX_DIR = 'snapshots/distance_matrix'
+# Кількість початкових вершин в одному завданні пулу процесів
+BLOCK_SIZE = 64
+
+
+# Рядки матриць для початкових вершин start..stop (graph=None - граф процесу-обробника пулу)
+def _compute_block(start, stop, engine, graph=None):
+    graph = worker_graph() if graph is None else graph
+    dist = np.empty((stop - start, graph.number_of_nodes()), dtype=np.float32)
+    pred = np.empty((stop - start, graph.number_of_nodes()), dtype=compact_index_dtype(graph.number_of_nodes()))
+    for row, i in enumerate(range(start, stop)):
+        dist[row], pred[row] = ARRAY_ENGINES[engine](graph, i)
+    return start, dist, pred
+
+
+def build_distance_matrix(graph, fingerprint, matrix_dir=MATRIX_DIR, max_workers=None, engine=DEFAULT_ENGINE):
+    """
+    Пакетне обчислення міток і попередників для всіх пар вершин: однаджерельний рушій
+    запускається з кожної вершини у пулі процесів, а рядки записуються у файли .npy
+    (dist - float32, pred - int16 або int32), які потім відкриваються через mmap.
+
+    Args:
+        graph (CSRGraph): Повний граф.
+        fingerprint (dict): Ключ CSV-джерел (source_fingerprint), з якими узгоджена матриця.
+        matrix_dir (str): Каталог матриці.
+        max_workers (int): Кількість процесів; 1 - обчислення в поточному процесі.
+        engine (str): Рушій оптимізації з ARRAY_ENGINES.
+    """
+    size = graph.number_of_nodes()
+    # Матриця підміняє попередню лише повністю записаною, як і знімок графа
+    with atomic_replace_dir(matrix_dir) as build_dir:
+        dist = np.lib.format.open_memmap(os.path.join(build_dir, 'dist.npy'), mode='w+', dtype=np.float32,
+                                         shape=(size, size))
+        pred = np.lib.format.open_memmap(os.path.join(build_dir, 'pred.npy'), mode='w+',
+                                         dtype=compact_index_dtype(size), shape=(size, size))
+
+        blocks = [(start, min(start + BLOCK_SIZE, size)) for start in range(0, size, BLOCK_SIZE)]
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers <= 1:
+            results = (_compute_block(start, stop, engine, graph) for start, stop in blocks)
+            for start, dist_block, pred_block in results:
+                dist[start:start + len(dist_block)] = dist_block
+                pred[start:start + len(pred_block)] = pred_block
+        else:
+            with graph_process_pool(graph, max_workers) as executor:
+                for start, dist_block, pred_block in executor.map(_compute_block, *zip(*blocks),
+                                                                   [engine] * len(blocks)):
+                    dist[start:start + len(dist_block)] = dist_block
+                    pred[start:start + len(pred_block)] = pred_block
+        dist.flush()
+        pred.flush()
+        del dist, pred
+
+        with open(os.path.join(build_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(dict(fingerprint, engine=engine, size=size), file, indent=4)
+    print(f"Матрицю відстаней збережено до {matrix_dir}")
+
+
+class DistanceMatrix:
+    """
+    Попередньо обчислені мітки (float32) та попередники для всіх пар вершин, відкриті через mmap.
+    Шлях між будь-якими двома вершинами відновлюється за рядком попередників без пошуку.
+    """
+
+    def __init__(self, graph, dist, pred):
+        self.graph = graph
+        self.dist = dist
+        self.pred = pred
+
+    def distance(self, start_node, end_node):
+        return float(self.dist[self.graph.index_of[start_node], self.graph.index_of[end_node]])
+
+    # Шлях у форматі reconstruct_path; мітки вздовж шляху накопичуються з ваг дуг у float64
+    def path(self, start_node, end_node):
+        start_index = self.graph.index_of[start_node]
+        end_index = self.graph.index_of[end_node]
+        path = None if end_index == start_index else path_from_pred(self.graph, self.pred[start_index], end_index)
+        return path or [f"{start_node} (Value: 0)"]
+
+
+def load_distance_matrix(graph, fingerprint, matrix_dir=MATRIX_DIR, engine=DEFAULT_ENGINE):
+    """
+    Відкриває матрицю відстаней, якщо вона побудована для тих самих CSV-джерел і рушія.
+
+    Returns:
+        DistanceMatrix: Матриця або None, якщо її немає чи вона застаріла.
+    """
+    try:
+        with open(os.path.join(matrix_dir, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta != dict(fingerprint, engine=engine, size=graph.number_of_nodes()):
+        print(f"Матриця відстаней у {matrix_dir} застаріла")
+        return None
+    # np.asarray знімає обгортку np.memmap без копіювання, як і в load_snapshot
+    dist = np.asarray(np.load(os.path.join(matrix_dir, 'dist.npy'), mmap_mode='r'))
+    pred = np.asarray(np.load(os.path.join(matrix_dir, 'pred.npy'), mmap_mode='r'))
+    return DistanceMatrix(graph, dist, pred)
+
+
+if __name__ == "__main__":
+    # Пакетне завдання: python distance_matrix.py [каталог матриці] [кількість процесів]
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else MATRIX_DIR
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    full_graph, _ = load_graph()
+    build_distance_matrix(full_graph, source_fingerprint(EDGES_FILE, NODES_FILE), target_dir, workers)
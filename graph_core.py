@@ -0,0 +1,382 @@
+import sys
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+
+NODES_FILE = 'csvs/nodes12_list.csv'
+
+# Схеми ваг дуг: назва -> функція від масивів R, N та стовпця Weight з CSV
+WEIGHT_SCHEMES = {
+    # N / R - стовпець Weight вихідного CSV
+    'ratio': lambda r, n, weight: weight,
+    # -log(R / N): сума ваг шляху - мінус логарифм імовірності ланцюжка асоціацій
+    'log': lambda r, n, weight: -np.log(r / n),
+    'inverse_r': lambda r, n, weight: 1.0 / r,
+    # Згладжена сила асоціації (R + 1) / (N + 2), обернена до ваги
+    'smoothed': lambda r, n, weight: (n + 2) / (r + 1),
+}
+DEFAULT_WEIGHT = 'ratio'
+
+
+# Номери елементів у діапазонах indptr[i]:indptr[i + 1] для всіх вершин nodes, без циклу Python
+def _edge_ranges(indptr, nodes):
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+
+
+class CSRGraph:
+    """
+    Орієнтований граф асоціацій, що зберігає дуги у стислому рядковому форматі (CSR).
+
+    Вершини мають внутрішні індекси 0..V-1 (позиції у відсортованому масиві ids). Вихідні дуги
+    вершини i займають позиції indptr[i]:indptr[i + 1] у масивах indices, weight, r та n.
+    Зовнішній інтерфейс (nodes, successors, predecessors, degree, edges) працює з ID вершин,
+    як і nx.DiGraph, тому граф можна передавати в ті самі функції.
+    """
+
+    def __init__(self, ids, indptr, indices, weight, r, n, names, labels, derived=None):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weight = weight
+        self.r = r
+        self.n = n
+        self.names = names
+        self.labels = labels
+        self.index_of = {int(node): i for i, node in enumerate(ids)}
+        self._edge_sources = None
+        self._edge_keys = None
+        self._csc = None
+        self._nx_view = None
+        self._weighted = {}
+        # Готові масиви ваг інших схем (наприклад, зі знімка) замість обчислення через WEIGHT_SCHEMES
+        self._scheme_weights = {}
+        # Граф з вагами CSV, від якого отримано цей граф через with_weight, і схема ваг масиву weight
+        self._base = None
+        self.scheme = DEFAULT_WEIGHT
+        # Готові похідні масиви (наприклад, відкриті через mmap зі знімка) замість обчислення в кожному процесі
+        if derived is not None:
+            self._edge_sources = derived['edge_sources']
+            self._edge_keys = derived['edge_keys']
+            self._csc = (derived['in_indptr'], derived['in_edges'])
+            self._scheme_weights = derived.get('scheme_weights', {})
+
+    # Похідні масиви, які можна зберегти разом із графом і спільно використовувати між процесами
+    def derived_arrays(self):
+        in_indptr, in_edges = self.csc()
+        return {
+            'edge_sources': self.edge_sources(),
+            'edge_keys': self.edge_keys(),
+            'in_indptr': in_indptr,
+            'in_edges': in_edges,
+        }
+
+    # Той самий граф з вагами схеми scheme; масив ваг обчислюється один раз, решта масивів спільні
+    def with_weight(self, scheme):
+        if scheme not in WEIGHT_SCHEMES:
+            raise ValueError(f"Невідома схема ваг: {scheme}. Доступні: {', '.join(WEIGHT_SCHEMES)}")
+        if self._base is not None:
+            return self._base.with_weight(scheme)
+        if scheme == DEFAULT_WEIGHT:
+            return self
+        graph = self._weighted.get(scheme)
+        if graph is None:
+            weight = self._scheme_weights.get(scheme)
+            if weight is None:
+                weight = WEIGHT_SCHEMES[scheme](self.r.astype(np.float64), self.n.astype(np.float64), self.weight)
+            graph = CSRGraph(self.ids, self.indptr, self.indices, np.ascontiguousarray(weight, dtype=np.float64),
+                             self.r, self.n, self.names, self.labels, self.derived_arrays())
+            graph._base = self
+            graph.scheme = scheme
+            self._weighted[scheme] = graph
+        return graph
+
+    # Кількість вершин і дуг
+    def number_of_nodes(self):
+        return len(self.ids)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, node):
+        return node in self.index_of
+
+    def nodes(self):
+        return self.ids.tolist()
+
+    # Індекс вершини-джерела для кожної дуги (обчислюється один раз)
+    def edge_sources(self):
+        if self._edge_sources is None:
+            self._edge_sources = np.repeat(np.arange(len(self.ids), dtype=np.int32), np.diff(self.indptr))
+        return self._edge_sources
+
+    # Вхідні дуги у форматі CSC: in_indptr та номери дуг, відсортовані за вершиною-ціллю
+    def csc(self):
+        if self._csc is None:
+            order = np.argsort(self.indices, kind='stable')
+            counts = np.bincount(self.indices, minlength=len(self.ids))
+            in_indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+            np.cumsum(counts, out=in_indptr[1:])
+            self._csc = (in_indptr, order)
+        return self._csc
+
+    def successors(self, node):
+        i = self.index_of[node]
+        return self.ids[self.indices[self.indptr[i]:self.indptr[i + 1]]].tolist()
+
+    def predecessors(self, node):
+        i = self.index_of[node]
+        in_indptr, in_edges = self.csc()
+        return self.ids[self.edge_sources()[in_edges[in_indptr[i]:in_indptr[i + 1]]]].tolist()
+
+    # Масив ступенів (вхідний + вихідний), як G.degree у networkx
+    def degree_array(self):
+        out_degree = np.diff(self.indptr)
+        in_degree = np.bincount(self.indices, minlength=len(self.ids))
+        return out_degree + in_degree
+
+    # Номери вихідних дуг (позиції в indices, weight, r, n) вершин з внутрішніми індексами nodes одним масивом
+    def out_edge_positions(self, nodes):
+        return _edge_ranges(self.indptr, nodes)
+
+    # Номери вхідних дуг вершин nodes у тих самих позиціях, згруповані за вершинами (порядок csc)
+    def in_edge_positions(self, nodes):
+        in_indptr, in_edges = self.csc()
+        return in_edges[_edge_ranges(in_indptr, nodes)]
+
+    @property
+    def degree(self):
+        return list(zip(self.ids.tolist(), self.degree_array().tolist()))
+
+    # Внутрішні індекси для масиву ID вершин; -1 для відсутніх вершин
+    def index_array(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        index = np.searchsorted(self.ids, nodes)
+        found = index < len(self.ids)
+        found[found] = self.ids[index[found]] == nodes[found]
+        return np.where(found, index, -1)
+
+    # Ключі дуг (індекс джерела * V + індекс цілі); у порядку CSR вони вже відсортовані
+    def edge_keys(self):
+        if self._edge_keys is None:
+            self._edge_keys = self.edge_sources().astype(np.int64) * len(self.ids) + self.indices
+        return self._edge_keys
+
+    # Номери дуг для масивів ID джерел і цілей за один прохід; -1, якщо дуги немає
+    def edge_positions(self, sources, targets):
+        source_index = self.index_array(sources)
+        target_index = self.index_array(targets)
+        keys = self.edge_keys()
+        if len(keys) == 0:
+            return np.full(len(source_index), -1, dtype=np.int64)
+        wanted = source_index * len(self.ids) + target_index
+        pos = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = (source_index >= 0) & (target_index >= 0) & (keys[pos] == wanted)
+        return np.where(found, pos, -1)
+
+    # Пошук номера дуги (u, v) у масивах CSR; None, якщо дуги немає
+    def edge_index(self, u, v):
+        pos = int(self.edge_positions([u], [v])[0])
+        return None if pos < 0 else pos
+
+    # Атрибути дуги у форматі, який раніше зберігав initialize_graph
+    def edge_data(self, e):
+        u = self.edge_sources()[e]
+        v = self.indices[e]
+        return {
+            'weight': float(self.weight[e]),
+            'R': int(self.r[e]),
+            'N': int(self.n[e]),
+            'Label': f"{self.r[e]} / {self.n[e]}",
+            'SourceWord': self.names[u],
+            'TargetWord': self.names[v],
+        }
+
+    def edges(self, data=False):
+        sources = self.edge_sources()
+        for e in range(len(self.indices)):
+            u = int(self.ids[sources[e]])
+            v = int(self.ids[self.indices[e]])
+            if data:
+                yield u, v, self.edge_data(e)
+            else:
+                yield u, v
+
+    # Підграф, індукований заданими вершинами
+    def subgraph(self, nodes):
+        keep = np.zeros(len(self.ids), dtype=bool)
+        keep[[self.index_of[node] for node in nodes]] = True
+        return self.masked_subgraph(keep, keep[self.edge_sources()] & keep[self.indices])
+
+    # Підграф з дуг, вибраних булевою маскою edge_mask, та їхніх кінцевих вершин
+    def edge_subgraph(self, edge_mask):
+        keep = np.zeros(len(self.ids), dtype=bool)
+        keep[self.edge_sources()[edge_mask]] = True
+        keep[self.indices[edge_mask]] = True
+        return self.masked_subgraph(keep, edge_mask)
+
+    # Підграф за масками вершин (keep) і дуг (mask); кінці всіх вибраних дуг мають бути серед вибраних вершин
+    def masked_subgraph(self, keep, mask):
+        sources = self.edge_sources()
+        new_index = np.cumsum(keep) - 1
+        sub_sources = new_index[sources[mask]]
+        counts = np.bincount(sub_sources, minlength=int(keep.sum()))
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return CSRGraph(self.ids[keep], indptr, new_index[self.indices[mask]].astype(np.int32),
+                        self.weight[mask], self.r[mask], self.n[mask], self.names[keep], self.labels[keep])
+
+    def copy(self):
+        return CSRGraph(self.ids.copy(), self.indptr.copy(), self.indices.copy(), self.weight.copy(),
+                        self.r.copy(), self.n.copy(), self.names.copy(), self.labels.copy())
+
+    # Таблиця дуг у форматі вихідного CSV
+    def edges_frame(self):
+        sources = self.edge_sources()
+        return pd.DataFrame({
+            'Source': self.ids[sources],
+            'Target': self.ids[self.indices],
+            'SourceWord': self.names[sources],
+            'TargetWord': self.names[self.indices],
+            'R': self.r,
+            'N': self.n,
+            'Weight': self.weight,
+            'Label': pd.Series(self.r).astype(str) + ' / ' + pd.Series(self.n).astype(str),
+        })
+
+    # Представлення у вигляді nx.DiGraph (для експорту в Gephi); будується лише на вимогу
+    def to_networkx(self):
+        if self._nx_view is None:
+            G = nx.DiGraph()
+            G.add_nodes_from(self.ids.tolist())
+            G.add_edges_from(self.edges(data=True))
+            self._nx_view = G
+        return self._nx_view
+
+
+# Побудова CSRGraph з DataFrame дуг векторизованими операціями pandas
+def build_csr_graph(df, nodes_file=NODES_FILE):
+    # Повторна дуга перезаписує попередню, як при G.add_edge у networkx
+    df = df.drop_duplicates(subset=['Source', 'Target'], keep='last')
+
+    source = df['Source'].to_numpy(dtype=np.int64)
+    target = df['Target'].to_numpy(dtype=np.int64)
+    ids = np.union1d(source, target)
+    source_index = np.searchsorted(ids, source)
+    target_index = np.searchsorted(ids, target).astype(np.int32)
+
+    order = np.lexsort((target_index, source_index))
+    counts = np.bincount(source_index, minlength=len(ids))
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    names, labels = _word_table(df, ids, nodes_file)
+    return CSRGraph(ids, indptr, target_index[order],
+                    df['Weight'].to_numpy(dtype=np.float64)[order],
+                    df['R'].to_numpy(dtype=np.int64)[order],
+                    df['N'].to_numpy(dtype=np.int64)[order],
+                    names, labels)
+
+
+# Таблиця слів і міток, вирівняна з масивом ids
+def _word_table(df, ids, nodes_file):
+    # Слова з самого CSV дуг використовуються, якщо вершини немає у файлі вершин
+    edge_words = pd.concat([
+        df[['Source', 'SourceWord']].set_axis(['Id', 'Name'], axis=1),
+        df[['Target', 'TargetWord']].set_axis(['Id', 'Name'], axis=1),
+    ]).drop_duplicates(subset='Id').set_index('Id')['Name']
+    names = edge_words.reindex(ids)
+    labels = pd.Series(None, index=ids, dtype=object)
+
+    if nodes_file is not None:
+        try:
+            node_df = pd.read_csv(nodes_file).drop_duplicates(subset='Id').set_index('Id')
+            names = node_df['Name'].reindex(ids).fillna(names)
+            labels = node_df['Label'].reindex(ids)
+        except FileNotFoundError:
+            print(f"Помилка: файл не знайдено - {nodes_file}")
+
+    # Інтернування рядків: однакові слова посилаються на один об'єкт
+    names = np.array([None if pd.isna(name) else sys.intern(str(name)) for name in names], dtype=object)
+    labels = np.array([None if pd.isna(label) else label for label in labels], dtype=object)
+    return names, labels
+
+
+# Таблиця дуг для перебудови графа (без рядкового стовпця Label, який build_csr_graph не використовує)
+def _edge_table(graph):
+    sources = graph.edge_sources()
+    return pd.DataFrame({
+        'Source': graph.ids[sources],
+        'Target': graph.ids[graph.indices],
+        'SourceWord': graph.names[sources],
+        'TargetWord': graph.names[graph.indices],
+        'R': graph.r,
+        'N': graph.n,
+        'Weight': graph.weight,
+    })
+
+
+# Дуги, вага яких відрізняється у двох версіях графа (порівнюються масиви weight, тобто схеми графів)
+def edge_weight_changes(old_graph, new_graph):
+    old_edges = _edge_table(old_graph)[['Source', 'Target', 'Weight']]
+    new_edges = _edge_table(new_graph)[['Source', 'Target', 'Weight']]
+    changes = old_edges.merge(new_edges, on=['Source', 'Target'], how='outer', suffixes=('Old', 'New'))
+    changes = changes.rename(columns={'WeightOld': 'OldWeight', 'WeightNew': 'NewWeight'}).fillna(np.inf)
+    return changes[changes['OldWeight'] != changes['NewWeight']].reset_index(drop=True)
+
+
+def apply_edge_delta(graph, upserts=None, deletions=None):
+    """
+    Застосовує до графа зміни нової хвилі опитування: додавання дуг, зміну R / N та видалення дуг.
+    Масиви графа можуть бути відкриті лише для читання (mmap), тому будується новий CSRGraph.
+
+    Зміни застосовуються до R, N і ваг CSV базового графа, а ваги схеми graph (with_weight)
+    обчислюються заново через WEIGHT_SCHEMES. Зміни для інших схем дає
+    edge_weight_changes(graph.with_weight(scheme), updated.with_weight(scheme)).
+
+    Args:
+        graph (CSRGraph): Поточний граф (будь-якої схеми ваг).
+        upserts (pd.DataFrame): Нові або змінені дуги у форматі CSV дуг (Source, Target, R, N;
+            Weight, SourceWord, TargetWord - необов'язкові, Weight за замовчуванням N / R).
+        deletions (list): Пари ID (Source, Target) дуг, що видаляються.
+
+    Returns:
+        tuple: (новий CSRGraph тієї самої схеми ваг, pd.DataFrame змін ваг цієї схеми з колонками
+        Source, Target, OldWeight, NewWeight; відсутня дуга має вагу inf).
+    """
+    base = graph if graph._base is None else graph._base
+    frame = _edge_table(base)
+    if deletions:
+        removed = pd.MultiIndex.from_tuples([(int(u), int(v)) for u, v in deletions])
+        frame = frame[~pd.MultiIndex.from_arrays([frame['Source'], frame['Target']]).isin(removed)]
+    if upserts is not None and len(upserts):
+        upserts = upserts.copy()
+        if 'Weight' not in upserts.columns:
+            upserts['Weight'] = upserts['N'] / upserts['R']
+        upserts['Weight'] = upserts['Weight'].fillna(upserts['N'] / upserts['R'])
+        for column, id_column in (('SourceWord', 'Source'), ('TargetWord', 'Target')):
+            index = graph.index_array(upserts[id_column])
+            # Слово вершини, якої ще немає в графі, - її ID, якщо його не задано в самій зміні
+            known_words = pd.Series([graph.names[i] if i >= 0 else str(node)
+                                     for i, node in zip(index.tolist(), upserts[id_column].tolist())],
+                                    index=upserts.index)
+            upserts[column] = upserts[column].fillna(known_words) if column in upserts.columns else known_words
+        frame = pd.concat([frame, upserts[frame.columns]], ignore_index=True)
+
+    updated = build_csr_graph(frame, nodes_file=None)
+    # Слова та мітки вже відомих вершин переносяться з поточного графа
+    index = graph.index_array(updated.ids)
+    known = index >= 0
+    updated.names[known] = graph.names[index[known]]
+    updated.labels[known] = graph.labels[index[known]]
+
+    updated = updated.with_weight(graph.scheme)
+    return updated, edge_weight_changes(graph, updated)
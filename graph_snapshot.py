@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+import numpy as np
+from graph_core import CSRGraph, NODES_FILE, WEIGHT_SCHEMES, DEFAULT_WEIGHT
+from local_optimization import read_graph_from_csv, initialize_graph
+from create_subgraph import create_subgraph_based_on_degree
+
+
+# Версія формату знімка; змінюється разом зі складом або типами збережених масивів
+SNAPSHOT_VERSION = 3
+SNAPSHOT_DIR = 'snapshots/full_graph'
+EDGES_FILE = 'csvs/cue1_response2_str_filtered_ROOT.csv'
+SUBGRAPH_SIZE = 25
+
+# Числові масиви CSRGraph, що зберігаються окремими .npy файлами і відкриваються через mmap
+_ARRAYS = ('ids', 'indptr', 'indices', 'weight', 'r', 'n')
+# Похідні масиви (CSC, джерела та ключі дуг); зберігаються, щоб процеси не обчислювали власні копії
+_DERIVED = ('edge_sources', 'edge_keys', 'in_indptr', 'in_edges')
+# Ваги схем, відмінних від схеми за замовчуванням (weight_<схема>.npy): спільні для процесів, як і решта масивів
+_SCHEMES = tuple(scheme for scheme in WEIGHT_SCHEMES if scheme != DEFAULT_WEIGHT)
+
+
+# SHA-256 вмісту файлу-джерела
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Ключ знімка: версія формату, хеші всіх CSV, з яких побудовано граф, і розмір підграфа
+def source_fingerprint(edges_file, nodes_file, subgraph_size=SUBGRAPH_SIZE):
+    return {
+        "version": SNAPSHOT_VERSION,
+        "edges": file_hash(edges_file),
+        "nodes": file_hash(nodes_file) if nodes_file is not None else None,
+        "subgraph_size": subgraph_size,
+    }
+
+
+@contextmanager
+def atomic_replace_dir(target_dir):
+    """
+    Тимчасовий каталог для запису нової версії target_dir. Після успішного виходу з блоку він
+    підміняє попередню версію перейменуванням, тож процеси, що вже відкрили старі файли через mmap,
+    продовжують працювати з ними, а паралельне перебудування кількома процесами безпечне.
+    Якщо блок завершився винятком, тимчасовий каталог видаляється, а попередня версія лишається.
+
+    Args:
+        target_dir (str): Каталог, що підміняється.
+
+    Yields:
+        str: Шлях до тимчасового каталогу.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(target_dir)), exist_ok=True)
+    build_dir = f'{target_dir}.build-{os.getpid()}'
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    try:
+        yield build_dir
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    # Стара версія відсувається убік; відкриті через mmap файли залишаються доступними до закриття
+    old_dir = f'{target_dir}.old-{os.getpid()}'
+    try:
+        os.rename(target_dir, old_dir)
+    except OSError:
+        pass
+    try:
+        os.rename(build_dir, target_dir)
+    except OSError:
+        # Інший процес встиг записати нову версію раніше - використовується його версія
+        shutil.rmtree(build_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# Рядки (слова, мітки) як один UTF-8 буфер, зміщення та маска наявності (None - відсутнє значення)
+def _pack_strings(values):
+    encoded = [None if value is None else str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    present = np.array([value is not None for value in encoded], dtype=bool)
+    np.cumsum([0 if value is None else len(value) for value in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(value for value in encoded if value is not None), dtype=np.uint8)
+    return data, offsets, present
+
+
+def _unpack_strings(data, offsets, present):
+    raw = data.tobytes()
+    return np.array([raw[start:end].decode('utf-8') if flag else None
+                     for start, end, flag in zip(offsets[:-1].tolist(), offsets[1:].tolist(), present.tolist())],
+                    dtype=object)
+
+
+def save_snapshot(graph, subgraph, fingerprint, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Зберігає скомпільований граф у каталог знімка: кожен масив - окремий .npy файл,
+    meta.json - версія формату та хеші CSV-джерел. Знімок підміняє попередній через
+    atomic_replace_dir.
+
+    Args:
+        graph (CSRGraph): Повний граф.
+        subgraph (CSRGraph): Демонстраційний підграф (зберігаються лише ID його вершин).
+        fingerprint (dict): Результат source_fingerprint.
+        snapshot_dir (str): Каталог знімка.
+    """
+    with atomic_replace_dir(snapshot_dir) as build_dir:
+        for name in _ARRAYS:
+            np.save(os.path.join(build_dir, f'{name}.npy'), getattr(graph, name))
+        for name, array in graph.derived_arrays().items():
+            np.save(os.path.join(build_dir, f'{name}.npy'), array)
+        for scheme in _SCHEMES:
+            np.save(os.path.join(build_dir, f'weight_{scheme}.npy'), graph.with_weight(scheme).weight)
+        for name in ('names', 'labels'):
+            data, offsets, present = _pack_strings(getattr(graph, name))
+            np.save(os.path.join(build_dir, f'{name}_data.npy'), data)
+            np.save(os.path.join(build_dir, f'{name}_offsets.npy'), offsets)
+            np.save(os.path.join(build_dir, f'{name}_present.npy'), present)
+        np.save(os.path.join(build_dir, 'subgraph_ids.npy'), subgraph.ids)
+        with open(os.path.join(build_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(fingerprint, file, indent=4)
+    print(f"Знімок графа збережено до {snapshot_dir}")
+
+
+def load_snapshot(fingerprint, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Відкриває знімок графа, якщо він відповідає поточним CSV-джерелам.
+
+    Args:
+        fingerprint (dict): Результат source_fingerprint для поточних CSV.
+        snapshot_dir (str): Каталог знімка.
+
+    Returns:
+        tuple: (CSRGraph, CSRGraph підграфа) або None, якщо знімка немає або він застарів.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta != fingerprint:
+        print(f"Знімок графа у {snapshot_dir} застарів")
+        return None
+
+    # np.asarray знімає обгортку np.memmap без копіювання: зрізи звичайного ndarray значно дешевші
+    def load(name, mmap_mode='r'):
+        return np.asarray(np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode=mmap_mode))
+
+    arrays = {name: load(name) for name in _ARRAYS}
+    derived = {name: load(name) for name in _DERIVED}
+    derived['scheme_weights'] = {scheme: load(f'weight_{scheme}') for scheme in _SCHEMES
+                                 if os.path.exists(os.path.join(snapshot_dir, f'weight_{scheme}.npy'))}
+    names, labels = (_unpack_strings(load(f'{name}_data', None), load(f'{name}_offsets', None),
+                                     load(f'{name}_present', None)) for name in ('names', 'labels'))
+    graph = CSRGraph(arrays['ids'], arrays['indptr'], arrays['indices'], arrays['weight'],
+                     arrays['r'], arrays['n'], names, labels, derived)
+    subgraph = graph.subgraph(load('subgraph_ids', None).tolist())
+    return graph, subgraph
+
+
+# Граф і демонстраційний підграф: зі знімка, а якщо він застарів - з CSV з оновленням знімка.
+# Вже обчислений fingerprint можна передати, щоб не хешувати CSV вдруге
+def load_graph(edges_file=EDGES_FILE, nodes_file=NODES_FILE, subgraph_size=SUBGRAPH_SIZE,
+               snapshot_dir=SNAPSHOT_DIR, fingerprint=None):
+    if fingerprint is None:
+        fingerprint = source_fingerprint(edges_file, nodes_file, subgraph_size)
+    snapshot = load_snapshot(fingerprint, snapshot_dir)
+    if snapshot is not None:
+        return snapshot
+
+    graph = initialize_graph(read_graph_from_csv(edges_file), nodes_file)
+    subgraph = create_subgraph_based_on_degree(graph, subgraph_size)
+    try:
+        save_snapshot(graph, subgraph, fingerprint, snapshot_dir)
+    except OSError as e:
+        print(f"Не вдалося зберегти знімок графа: {e}")
+    return graph, subgraph
+
+
+if __name__ == "__main__":
+    # Крок збирання: python graph_snapshot.py [каталог знімка]
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_DIR
+    sources = source_fingerprint(EDGES_FILE, NODES_FILE)
+    full_graph = initialize_graph(read_graph_from_csv(EDGES_FILE), NODES_FILE)
+    save_snapshot(full_graph, create_subgraph_based_on_degree(full_graph, SUBGRAPH_SIZE), sources, target_dir)
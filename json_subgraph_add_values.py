@@ -1,6 +1,8 @@
+import copy
 import json
-from local_optimization import local_optimize_graph, read_graph_from_csv, initialize_graph
+from local_optimization import local_optimize_graph, read_graph_from_csv, initialize_graph, get_node_value
 from create_subgraph import create_subgraph_based_on_degree
+from opt_path_to_json import update_edge_label
 
 
 def modify_json_data(source_file, destination_file):
@@ -32,28 +34,32 @@ def set_initial_values(G, start_node):
     G.nodes[start_node]['value'] = 0
 
 
+def apply_is_in_path(data, path):
+    """Marks the path nodes and edges in already loaded JSON data."""
+    # Отримання ідентифікаторів вузлів зі шляху
+    node_ids = [int(node.split(" ")[0]) for node in path]
+
+    # Встановлення значень атрибутів для вузлів
+    for node in data['nodes']:
+        if int(node['key']) in node_ids:
+            node['attributes']['is_in_path'] = True
+            node['attributes']['value'] = None  # or another calculated value, depending on context
+
+    # Встановлення атрибутів тільки для ребер, які з'єднують сусідні вузли у шляху
+    path_edges = set(zip(node_ids[:-1], node_ids[1:]))
+    for edge in data['edges']:
+        if (int(edge['source']), int(edge['target'])) in path_edges:
+            edge['attributes']['is_in_path'] = True
+    return data
+
+
 def update_is_in_path(input_file, output_file, path):
     """Updates JSON data for the path and saves the final results."""
     try:
         with open(input_file, 'r', encoding='utf-8') as file:
             data = json.load(file)
 
-        # Отримання ідентифікаторів вузлів зі шляху
-        node_ids = [int(node.split(" ")[0]) for node in path]
-
-        # Встановлення значень атрибутів для вузлів
-        for node in data['nodes']:
-            if int(node['key']) in node_ids:
-                node['attributes']['is_in_path'] = True
-                node['attributes']['value'] = None  # or another calculated value, depending on context
-
-        # Встановлення атрибутів тільки для ребер, які з'єднують сусідні вузли у шляху
-        for i in range(len(node_ids) - 1):
-            from_node = node_ids[i]
-            to_node = node_ids[i + 1]
-            for edge in data['edges']:
-                if int(edge['source']) == from_node and int(edge['target']) == to_node:
-                    edge['attributes']['is_in_path'] = True
+        apply_is_in_path(data, path)
 
         # Збереження кінцевого JSON файла
         with open(output_file, 'w', encoding='utf-8') as file:
@@ -64,24 +70,31 @@ def update_is_in_path(input_file, output_file, path):
         print(f"Error updating and saving JSON: {e}")
 
 
-def update_values_and_labels(input_file, output_file, graph):
+def apply_values_and_labels(data, graph, all_paths=None):
+    """Writes the optimized node values into already loaded JSON data."""
+    # Обновление значений для всех вершин
+    for node in data['nodes']:
+        node_key = int(node['key'])
+        # Получение значения узла из графа, с предварительной проверкой на бесконечность
+        node_value = get_node_value(graph, all_paths, node_key) if all_paths is not None \
+            else graph.nodes[node_key].get('value')
+        if node_value is None or node_value == float('inf'):
+            node_value_str = 'inf'
+        else:
+            node_value_str = f"{node_value:.1f}"  # Округление до 1 знака после запятой
+
+        # Установка значения 'value' и обновление 'label'
+        node['attributes']['value'] = node_value_str
+        node['attributes']['label'] += f" | мітка = {node_value_str}"
+    return data
+
+
+def update_values_and_labels(input_file, output_file, graph, all_paths=None):
     try:
         with open(input_file, 'r', encoding='utf-8') as file:
             data = json.load(file)
 
-        # Обновление значений для всех вершин
-        for node in data['nodes']:
-            node_key = int(node['key'])
-            # Получение значения узла из графа, с предварительной проверкой на бесконечность
-            node_value = graph.nodes[node_key].get('value')
-            if node_value is None or node_value == float('inf'):
-                node_value_str = 'inf'
-            else:
-                node_value_str = f"{node_value:.1f}"  # Округление до 1 знака после запятой
-
-            # Установка значения 'value' и обновление 'label'
-            node['attributes']['value'] = node_value_str
-            node['attributes']['label'] += f" | мітка = {node_value_str}"
+        apply_values_and_labels(data, graph, all_paths)
 
         with open(output_file, 'w', encoding='utf-8') as file:
             json.dump(data, file, indent=4, ensure_ascii=False)
@@ -91,6 +104,40 @@ def update_values_and_labels(input_file, output_file, graph):
         print(f"Error while updating values and labels in JSON: {e}")
 
 
+def subgraph_template(graph):
+    """Builds the subgraph JSON without values (the format of jsons/subgraph_no_values.json) from the graph arrays."""
+    # Розмір вершини пропорційний її ступеню в підграфі; координат немає - розміщення робить клієнт
+    degree = graph.degree_array()
+    max_degree = max(int(degree.max()), 1) if len(degree) else 1
+    nodes = [{
+        "key": str(node),
+        "attributes": {"label": label if label is not None else str(node), "name": name,
+                       "size": 10.0 + 20.0 * node_degree / max_degree, "is_in_path": False, "value": "inf"},
+    } for node, name, label, node_degree in zip(graph.ids.tolist(), graph.names.tolist(), graph.labels.tolist(),
+                                                degree.tolist())]
+
+    sources = graph.ids[graph.edge_sources()].tolist()
+    targets = graph.ids[graph.indices].tolist()
+    edges = [{
+        "key": str(e),
+        "source": str(u),
+        "target": str(v),
+        "attributes": {"label": update_edge_label(f"{r} / {n}", weight), "weight": weight, "r": r, "n": n,
+                       "is_in_path": False},
+    } for e, (u, v, r, n, weight) in enumerate(zip(sources, targets, graph.r.tolist(), graph.n.tolist(),
+                                                   graph.weight.tolist()))]
+    return {"options": {"multi": False, "allowSelfLoops": True, "type": "directed"}, "nodes": nodes, "edges": edges}
+
+
+def build_subgraph_payload(template, graph, all_paths, path):
+    """Builds the subgraph JSON with values and the highlighted path in memory, without touching files."""
+    data = copy.deepcopy(template)
+    apply_values_and_labels(data, graph, all_paths)
+    if path:
+        apply_is_in_path(data, path)
+    return data
+
+
 def update_json_with_path_and_save(input_file, output_file, path):
     """Updates JSON data for the path and saves the final results."""
     try:
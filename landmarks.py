@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import numpy as np
+from local_optimization import ARRAY_ENGINES, REVERSE_ENGINES, DEFAULT_ENGINE
+from graph_snapshot import load_graph, source_fingerprint, atomic_replace_dir, EDGES_FILE
+from graph_core import WEIGHT_SCHEMES, DEFAULT_WEIGHT, NODES_FILE
+
+
+LANDMARKS_DIR = 'snapshots/landmarks'
+# Кількість орієнтирів за замовчуванням: 2 * 16 пошуків під час побудови, 2 * 16 * 8 байт на вершину
+DEFAULT_LANDMARKS = 16
+LANDMARK_METHODS = ('degree', 'farthest')
+
+
+def select_landmarks(graph, k=DEFAULT_LANDMARKS, method='degree', engine=DEFAULT_ENGINE):
+    """
+    Вибирає орієнтири та обчислює відстані від них і до них.
+
+    Вершини впорядковуються за ступенем, як у create_subgraph_based_on_degree. Метод 'degree'
+    бере k вершин з найбільшим ступенем; метод 'farthest' починає з такої вершини, а далі
+    додає найвищу за ступенем вершину, не пов'язану з жодним орієнтиром, або, якщо таких немає,
+    вершину, найвіддаленішу від уже вибраних орієнтирів.
+
+    Args:
+        graph (CSRGraph): Граф асоціацій.
+        k (int): Кількість орієнтирів.
+        method (str): 'degree' або 'farthest'.
+        engine (str): Рушій оптимізації з ARRAY_ENGINES і REVERSE_ENGINES.
+
+    Returns:
+        tuple: (індекси орієнтирів, відстані від орієнтирів (k x V), відстані до орієнтирів (k x V)).
+    """
+    if method not in LANDMARK_METHODS:
+        raise ValueError(f"Невідомий метод вибору орієнтирів: {method}. Доступні: {', '.join(LANDMARK_METHODS)}")
+    size = graph.number_of_nodes()
+    k = min(k, size)
+    # Стабільне сортування зберігає порядок вершин з однаковим ступенем, як sorted у create_subgraph
+    by_degree = np.argsort(-graph.degree_array(), kind='stable')
+
+    chosen = []
+    from_landmark = np.empty((k, size), dtype=np.float64)
+    to_landmark = np.empty((k, size), dtype=np.float64)
+    # Найменша відстань кожної вершини до будь-якого з вибраних орієнтирів (в обидва боки)
+    nearest = np.full(size, np.inf)
+    for row in range(k):
+        if method == 'degree' or not chosen:
+            index = int(by_degree[row])
+        else:
+            uncovered = np.isinf(nearest)
+            if uncovered.any():
+                index = int(by_degree[np.argmax(uncovered[by_degree])])
+            else:
+                index = int(np.argmax(nearest))
+        chosen.append(index)
+        from_landmark[row] = ARRAY_ENGINES[engine](graph, index)[0]
+        to_landmark[row] = REVERSE_ENGINES[engine](graph, index)[0]
+        np.minimum(nearest, np.minimum(from_landmark[row], to_landmark[row]), out=nearest)
+    return np.array(chosen, dtype=np.int64), from_landmark, to_landmark
+
+
+class LandmarkIndex:
+    """
+    Відстані від орієнтирів і до них (ALT). За нерівністю трикутника для будь-яких v, t і орієнтира L
+    d(v, t) >= d(L, t) - d(L, v) та d(v, t) >= d(v, L) - d(t, L); ці оцінки спрямовують пошук A*.
+    """
+
+    def __init__(self, graph, landmarks, from_landmark, to_landmark):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.from_landmark = from_landmark
+        self.to_landmark = to_landmark
+
+    @property
+    def landmark_ids(self):
+        return self.graph.ids[self.landmarks].tolist()
+
+    def lower_bounds(self, end_index):
+        """
+        Нижні оцінки відстані від кожної вершини до end_index.
+
+        Returns:
+            np.ndarray: Оцінки float64; inf - вершина гарантовано не досягає end_index.
+        """
+        with np.errstate(invalid='ignore'):
+            forward = self.from_landmark[:, end_index, None] - self.from_landmark
+            backward = self.to_landmark - self.to_landmark[:, end_index, None]
+            # inf - inf (обидві відстані невідомі) дає NaN, який np.fmax пропускає: такий орієнтир не дає оцінки
+            bounds = np.fmax.reduce(np.fmax(forward, backward), axis=0)
+        return np.fmax(bounds, 0.0)
+
+
+def build_landmarks(graph, fingerprint, landmarks_dir=LANDMARKS_DIR, k=DEFAULT_LANDMARKS, method='degree',
+                    weight=DEFAULT_WEIGHT):
+    """
+    Вибирає орієнтири і зберігає індекс поряд зі знімком графа (окремий підкаталог для кожної схеми ваг).
+
+    Args:
+        graph (CSRGraph): Граф зі схемою ваг weight.
+        fingerprint (dict): Ключ CSV-джерел (source_fingerprint), з якими узгоджений індекс.
+        landmarks_dir (str): Каталог індексів орієнтирів.
+        k (int): Кількість орієнтирів.
+        method (str): 'degree' або 'farthest'.
+        weight (str): Схема ваг з WEIGHT_SCHEMES.
+
+    Returns:
+        LandmarkIndex: Побудований індекс.
+    """
+    landmarks, from_landmark, to_landmark = select_landmarks(graph, k, method)
+    index_dir = os.path.join(landmarks_dir, weight)
+    with atomic_replace_dir(index_dir) as build_dir:
+        np.save(os.path.join(build_dir, 'landmarks.npy'), landmarks)
+        np.save(os.path.join(build_dir, 'from_landmark.npy'), from_landmark)
+        np.save(os.path.join(build_dir, 'to_landmark.npy'), to_landmark)
+        with open(os.path.join(build_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(dict(fingerprint, weight=weight, k=k, method=method), file, indent=4)
+    print(f"Орієнтири ({weight}) збережено до {index_dir}")
+    return LandmarkIndex(graph, landmarks, from_landmark, to_landmark)
+
+
+def load_landmarks(graph, fingerprint, landmarks_dir=LANDMARKS_DIR, k=DEFAULT_LANDMARKS, method='degree',
+                   weight=DEFAULT_WEIGHT):
+    """
+    Відкриває індекс орієнтирів, якщо він побудований для тих самих CSV-джерел і параметрів.
+
+    Returns:
+        LandmarkIndex: Індекс або None, якщо його немає чи він застарів.
+    """
+    index_dir = os.path.join(landmarks_dir, weight)
+    try:
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta != dict(fingerprint, weight=weight, k=k, method=method):
+        print(f"Орієнтири у {index_dir} застаріли")
+        return None
+    arrays = [np.asarray(np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r'))
+              for name in ('landmarks', 'from_landmark', 'to_landmark')]
+    return LandmarkIndex(graph, *arrays)
+
+
+# Індекс орієнтирів: з диска, а якщо він застарів - побудова з оновленням файлів
+def landmark_index(graph, fingerprint, landmarks_dir=LANDMARKS_DIR, k=DEFAULT_LANDMARKS, method='degree',
+                   weight=DEFAULT_WEIGHT):
+    index = load_landmarks(graph, fingerprint, landmarks_dir, k, method, weight)
+    if index is not None:
+        return index
+    try:
+        return build_landmarks(graph, fingerprint, landmarks_dir, k, method, weight)
+    except OSError as e:
+        print(f"Не вдалося зберегти орієнтири: {e}")
+        return LandmarkIndex(graph, *select_landmarks(graph, k, method))
+
+
+if __name__ == "__main__":
+    # Крок збирання: python landmarks.py [кількість орієнтирів] [degree|farthest]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LANDMARKS
+    selection = sys.argv[2] if len(sys.argv) > 2 else 'degree'
+    full_graph, _ = load_graph()
+    sources = source_fingerprint(EDGES_FILE, NODES_FILE)
+    for scheme in WEIGHT_SCHEMES:
+        build_landmarks(full_graph.with_weight(scheme), sources, k=count, method=selection, weight=scheme)
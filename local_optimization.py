@@ -1,7 +1,44 @@
+import heapq
+import threading
+from collections import Counter
+from collections.abc import Mapping
+import numpy as np
 import pandas as pd
-import networkx as nx
 import matplotlib.pyplot as plt
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from graph_core import CSRGraph, build_csr_graph, NODES_FILE, DEFAULT_WEIGHT
+
+
+# Лічильники роботи рушіїв за (рушій, лічильник): запуски, проходи (sweeps), переглянуті дуги
+# (relaxations) та вершини з встановленою міткою (nodes_settled); спільні для потоків процесу
+optimizer_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(engine, **counts):
+    with _counters_lock:
+        optimizer_counters[(engine, 'runs')] += 1
+        for name, value in counts.items():
+            optimizer_counters[(engine, name)] += int(value)
+
+
+# Новий замок і порожні лічильники для процесу-обробника пулу: після fork замок батьківського процесу
+# міг лишитися захопленим іншим його потоком, а лічильники - містити чужі значення
+def reset_optimizer_counters():
+    global _counters_lock
+    _counters_lock = threading.Lock()
+    optimizer_counters.clear()
+
+
+# Лічильники, накопичені в іншому процесі (наприклад, у процесі пулу), додаються до лічильників цього процесу
+def merge_optimizer_counters(delta):
+    with _counters_lock:
+        optimizer_counters.update(delta)
+
+
+# Кількість вихідних дуг вершин, позначених у масиві settled
+def _out_edges_of(G, settled):
+    return np.diff(G.indptr)[np.frombuffer(settled, dtype=bool)].sum()
 
 
 # Зчитування графу з CSV файлу
@@ -11,13 +48,77 @@ def read_graph_from_csv(file_path):
 
 
 # Ініціалізація орієнтованого графа з DataFrame
-def initialize_graph(df):
-    G = nx.DiGraph()
-    # Додавання дуг з усіма атрибутами, включно з SourceWord і TargetWord
-    for index, row in df.iterrows():
-        G.add_edge(row['Source'], row['Target'], weight=row['Weight'], R=row['R'], N=row['N'],
-                   Label=row['Label'], SourceWord=row['SourceWord'], TargetWord=row['TargetWord'])
-    return G
+def initialize_graph(df, nodes_file=NODES_FILE, weight=DEFAULT_WEIGHT):
+    # Дуги зберігаються у масивах CSR; nx.DiGraph доступний через G.to_networkx()
+    # weight - схема ваг з WEIGHT_SCHEMES; інші схеми доступні через G.with_weight(...)
+    return build_csr_graph(df, nodes_file).with_weight(weight)
+
+
+class ShortestPathTree(Mapping):
+    """
+    Результат оптимізації CSRGraph: мітки (dist) та попередники (pred) вершин у масивах,
+    проіндексованих внутрішніми індексами графа. Поводиться як словник попередників
+    {ID вершини: ID попередника або None}, який повертає parallel_optimization.
+
+    У зворотному режимі (reverse=True) start_node - кінцева вершина всіх шляхів: dist - мітки
+    від кожної вершини до неї, а pred - наступна вершина на шляху до неї.
+    """
+
+    def __init__(self, graph, start_node, dist, pred, reverse=False):
+        self.graph = graph
+        self.start_node = start_node
+        self.start_index = graph.index_of[start_node]
+        self.dist = dist
+        self.pred = pred
+        self.reverse = reverse
+
+    def __getitem__(self, node):
+        predecessor = self.pred[self.graph.index_of[node]]
+        return None if predecessor < 0 else int(self.graph.ids[predecessor])
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def __len__(self):
+        return len(self.graph)
+
+    def value(self, node):
+        index = self.graph.index_of[node]
+        # Початкова вершина має цілу мітку 0, як після set_initial_values
+        return 0 if index == self.start_index else float(self.dist[index])
+
+
+class MultiSourceTree(ShortestPathTree):
+    """
+    Результат оптимізації від кількох початкових вершин одночасно: для кожної вершини, крім мітки
+    й попередника, зберігається найближча початкова вершина (origin), від якої веде її шлях.
+    """
+
+    def __init__(self, graph, sources, dist, pred, origin):
+        self.graph = graph
+        self.sources = list(sources)
+        self.start_node = None
+        self.start_index = None
+        self.dist = dist
+        self.pred = pred
+        self.origin = origin
+
+    def value(self, node):
+        value = float(self.dist[self.graph.index_of[node]])
+        # Початкові вершини без зміщення мають цілу мітку 0, як і в ShortestPathTree
+        return 0 if value == 0 and node in self.sources else value
+
+    # ID найближчої початкової вершини або None, якщо вершина недосяжна з жодної
+    def source_of(self, node):
+        origin = self.origin[self.graph.index_of[node]]
+        return None if origin < 0 else int(self.graph.ids[origin])
+
+
+# Мітка вершини після оптимізації
+def get_node_value(G, all_paths, node):
+    if isinstance(all_paths, ShortestPathTree):
+        return all_paths.value(node)
+    return G.nodes[node]['value']
 
 
 # Встановлення початкових значень для вершин
@@ -44,8 +145,10 @@ def minimize_value(G, node):
 def parallel_optimization(G, start_node):
     changed = True
     path = {node: None for node in G.nodes()}
+    sweeps = 0
     while changed:
         changed = False
+        sweeps += 1
         with ThreadPoolExecutor(max_workers=len(G.nodes())) as executor:
             futures = {executor.submit(minimize_value, G, node): node for node in G.nodes() if node != start_node}
             results = {}
@@ -59,38 +162,263 @@ def parallel_optimization(G, start_node):
             if updated:
                 G.nodes[node]['value'] = new_value
                 path[node] = best_predecessor
+    _count('reference', sweeps=sweeps, relaxations=sweeps * G.number_of_edges(),
+           nodes_settled=sum(1 for node in G if G.nodes[node]['value'] < float('inf')))
     return G, path
 
 
+# Однаджерельна оптимізація графа на бінарній купі (алгоритм Дейкстри)
+def heap_optimization(G, start_node):
+    """
+    Обчислює ту саму нерухому точку, що й parallel_optimization, але встановлює мітку кожної
+    вершини рівно один раз. Коректна, бо всі ваги дуг (N / R) додатні.
+
+    Значення 'value' збігаються з еталонним режимом; за однакових міток попередник може
+    відрізнятися від того, який обрав би еталонний режим.
+
+    Args:
+        G (nx.DiGraph): Граф з початковими значеннями (див. set_initial_values).
+        start_node (int): ID початкової вершини.
+
+    Returns:
+        tuple: Граф з оновленими 'value' та словник попередників.
+    """
+    path = {node: None for node in G.nodes()}
+    settled = set()
+    heap = [(0, start_node)]
+    while heap:
+        value, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        for successor, data in G[node].items():
+            new_value = value + data['weight']
+            if new_value < G.nodes[successor]['value']:
+                G.nodes[successor]['value'] = new_value
+                path[successor] = node
+                heapq.heappush(heap, (new_value, successor))
+    return G, path
+
+
+# Алгоритм Дейкстри над масивами CSRGraph
+def csr_heap_optimization(G, start_index):
+    indptr, indices, weight = G.indptr, G.indices, G.weight
+    dist = [float('inf')] * G.number_of_nodes()
+    pred = [-1] * G.number_of_nodes()
+    settled = bytearray(G.number_of_nodes())
+    dist[start_index] = 0.0
+    heap = [(0.0, start_index)]
+    while heap:
+        value, i = heapq.heappop(heap)
+        if settled[i]:
+            continue
+        settled[i] = 1
+        start, end = indptr[i], indptr[i + 1]
+        for j, w in zip(indices[start:end].tolist(), weight[start:end].tolist()):
+            new_value = value + w
+            if new_value < dist[j]:
+                dist[j] = new_value
+                pred[j] = i
+                heapq.heappush(heap, (new_value, j))
+    _count('dijkstra', relaxations=_out_edges_of(G, settled), nodes_settled=settled.count(1))
+    return np.array(dist, dtype=np.float64), np.array(pred, dtype=np.int32)
+
+
+# Алгоритм Дейкстри від кількох початкових вершин з початковими мітками offsets
+def csr_multi_source_optimization(G, start_indices, offsets):
+    indptr, indices, weight = G.indptr, G.indices, G.weight
+    dist = [float('inf')] * G.number_of_nodes()
+    pred = [-1] * G.number_of_nodes()
+    origin = [-1] * G.number_of_nodes()
+    settled = bytearray(G.number_of_nodes())
+    heap = []
+    for i, offset in zip(start_indices, offsets):
+        if offset < dist[i]:
+            dist[i] = offset
+            origin[i] = i
+            heap.append((offset, i))
+    heapq.heapify(heap)
+    while heap:
+        value, i = heapq.heappop(heap)
+        if settled[i]:
+            continue
+        settled[i] = 1
+        start, end = indptr[i], indptr[i + 1]
+        for j, w in zip(indices[start:end].tolist(), weight[start:end].tolist()):
+            new_value = value + w
+            if new_value < dist[j]:
+                dist[j] = new_value
+                pred[j] = i
+                origin[j] = origin[i]
+                heapq.heappush(heap, (new_value, j))
+    _count('multi_source', relaxations=_out_edges_of(G, settled), nodes_settled=settled.count(1))
+    return (np.array(dist, dtype=np.float64), np.array(pred, dtype=np.int32),
+            np.array(origin, dtype=np.int32))
+
+
+# Алгоритм Дейкстри у зворотному напрямку: за вхідними дугами (CSC) від кінцевої вершини
+def csr_reverse_heap_optimization(G, end_index):
+    in_indptr, in_edges = G.csc()
+    edge_sources, weight = G.edge_sources(), G.weight
+    dist = [float('inf')] * G.number_of_nodes()
+    successor = [-1] * G.number_of_nodes()
+    settled = bytearray(G.number_of_nodes())
+    dist[end_index] = 0.0
+    heap = [(0.0, end_index)]
+    while heap:
+        value, i = heapq.heappop(heap)
+        if settled[i]:
+            continue
+        settled[i] = 1
+        edges = in_edges[in_indptr[i]:in_indptr[i + 1]]
+        for j, w in zip(edge_sources[edges].tolist(), weight[edges].tolist()):
+            new_value = value + w
+            if new_value < dist[j]:
+                dist[j] = new_value
+                successor[j] = i
+                heapq.heappush(heap, (new_value, j))
+    settled_mask = np.frombuffer(settled, dtype=bool)
+    _count('reverse_dijkstra', relaxations=np.diff(in_indptr)[settled_mask].sum(), nodes_settled=settled.count(1))
+    return np.array(dist, dtype=np.float64), np.array(successor, dtype=np.int32)
+
+
+# Еталонний ітераційний алгоритм для CSRGraph (виконується над представленням nx.DiGraph)
+def csr_reference_optimization(G, start_index):
+    nx_graph = G.to_networkx()
+    start_node = int(G.ids[start_index])
+    set_initial_values(nx_graph, start_node)
+    _, path = parallel_optimization(nx_graph, start_node)
+    nodes = G.nodes()
+    dist = np.array([nx_graph.nodes[node]['value'] for node in nodes], dtype=np.float64)
+    pred = np.array([-1 if path[node] is None else G.index_of[path[node]] for node in nodes], dtype=np.int32)
+    return dist, pred
+
+
+# Векторизований ітераційний алгоритм: кожен прохід - одна операція np.minimum.at над масивами дуг
+def vectorized_optimization(G, start_index):
+    """
+    Той самий метод локальної оптимізації, що й parallel_optimization: на кожному проході мітка
+    вершини мінімізується за попередниками з міток попереднього проходу, доки вони змінюються.
+    Прохід розглядає лише дуги, що виходять з вершин, мітки яких покращилися на попередньому
+    проході (активний фронт), - решта дуг не може дати нового мінімуму.
+
+    Попередником стає вершина, що дала мінімум на проході, коли мітка востаннє покращилася;
+    серед однакових кандидатів обирається вершина з найменшим індексом.
+
+    Args:
+        G (CSRGraph): Граф асоціацій.
+        start_index (int): Внутрішній індекс початкової вершини.
+
+    Returns:
+        tuple: Масиви dist (float64) та pred (int32, -1 - попередника немає).
+    """
+    indptr, targets, weight = G.indptr, G.indices, G.weight
+    dist = np.full(G.number_of_nodes(), np.inf)
+    pred = np.full(G.number_of_nodes(), -1, dtype=np.int32)
+    dist[start_index] = 0.0
+    active = np.array([start_index])
+    sweeps = relaxations = 0
+
+    while len(active):
+        # Номери вихідних дуг активних вершин одним масивом
+        edges = G.out_edge_positions(active)
+        sources = np.repeat(active, indptr[active + 1] - indptr[active])
+        sweeps += 1
+        relaxations += len(edges)
+        candidates = dist[sources] + weight[edges]
+
+        new_dist = dist.copy()
+        np.minimum.at(new_dist, targets[edges], candidates)
+        new_dist[start_index] = 0.0
+        improved = new_dist < dist
+
+        # Дуги, що дали новий мінімум; дуги йдуть за зростанням джерела, тож перша - з найменшим індексом
+        winners = improved[targets[edges]] & (candidates == new_dist[targets[edges]])
+        won_targets, first = np.unique(targets[edges][winners], return_index=True)
+        pred[won_targets] = sources[winners][first]
+
+        dist = new_dist
+        active = np.flatnonzero(improved)
+    _count('vectorized', sweeps=sweeps, relaxations=relaxations, nodes_settled=np.isfinite(dist).sum())
+    return dist, pred
+
+
+# Доступні рушії оптимізації: 'reference' - початковий ітераційний алгоритм для перевірки результатів
+OPTIMIZATION_ENGINES = {
+    'dijkstra': heap_optimization,
+    'reference': parallel_optimization,
+}
+# Ті самі рушії для CSRGraph: приймають індекс початкової вершини, повертають масиви dist та pred
+ARRAY_ENGINES = {
+    'dijkstra': csr_heap_optimization,
+    'reference': csr_reference_optimization,
+    'vectorized': vectorized_optimization,
+}
+# Рушії зворотного режиму (усі вершини -> одна): приймають індекс кінцевої вершини
+REVERSE_ENGINES = {
+    'dijkstra': csr_reverse_heap_optimization,
+}
+DEFAULT_ENGINE = 'dijkstra'
+
+
 def reconstruct_path(G, all_paths, start_node, end_node):
     if end_node not in all_paths or all_paths[end_node] is None:
         # Возвращаем только стартовый узел, если путь до конечного узла не существует
-        node_value = round(G.nodes[start_node]['value'], 2)
+        node_value = round(get_node_value(G, all_paths, start_node), 2)
         return [f"{start_node} (Value: {node_value})"]
 
     reversed_path = []
     current = end_node
     while current != start_node:
-        node_value = round(G.nodes[current]['value'], 2)
+        node_value = round(get_node_value(G, all_paths, current), 2)
         reversed_path.append(f"{current} (Value: {node_value})")
         current = all_paths[current]
         if current is None:
             break
-    node_value = round(G.nodes[start_node]['value'], 2)
+    node_value = round(get_node_value(G, all_paths, start_node), 2)
     reversed_path.append(f"{start_node} (Value: {node_value})")
     reversed_path.reverse()
     return reversed_path
 
 
+# Шлях від start_node до кінцевої вершини дерева зворотного режиму (end_node) за наступними вершинами
+def reconstruct_reverse_path(G, all_paths, start_node, end_node):
+    start_index = G.index_of[start_node]
+    if start_index != all_paths.start_index and all_paths.pred[start_index] < 0:
+        return [f"{start_node} (Value: 0)"]
+    chain = _chain(all_paths.pred, start_index)
+    return _path_with_values(G, chain)
+
+
 # Локальна оптимізація графа
-def local_optimize_graph(G, start_node):
+def local_optimize_graph(G, start_node, engine=DEFAULT_ENGINE, reverse=False):
+    """
+    Обчислює мітки всіх вершин від start_node (або, якщо reverse=True, від усіх вершин до start_node).
+
+    Для CSRGraph повертає (G, ShortestPathTree), граф не змінюється. Для nx.DiGraph мітки
+    записуються в атрибут 'value' вершин, а зворотний режим виконується над поданням
+    G.reverse(copy=False) без копіювання графа.
+    """
+    if isinstance(G, CSRGraph):
+        engines = REVERSE_ENGINES if reverse else ARRAY_ENGINES
+    else:
+        engines = OPTIMIZATION_ENGINES
+    if engine not in engines:
+        raise ValueError(f"Невідомий рушій оптимізації: {engine}. Доступні: {', '.join(engines)}")
+
     try:
         '''if start_node not in G.nodes() or end_node not in G.nodes():
             print(f"Одна або обидві вершини {start_node}, {end_node} відсутні в графі.")
             return None, None  # Return None if either node is missing'''
 
-        set_initial_values(G, start_node)
-        optimized_graph, all_paths = parallel_optimization(G, start_node)
+        if isinstance(G, CSRGraph):
+            dist, pred = engines[engine](G, G.index_of[start_node])
+            optimized_graph, all_paths = G, ShortestPathTree(G, start_node, dist, pred, reverse=reverse)
+        else:
+            view = G.reverse(copy=False) if reverse else G
+            set_initial_values(view, start_node)
+            _, all_paths = OPTIMIZATION_ENGINES[engine](view, start_node)
+            optimized_graph = G
         '''for node, data in sorted(optimized_graph.nodes(data=True), key=lambda x: x[0]):
             shortest_path = reconstruct_path(optimized_graph, path, start_node, node)
             print(f"Вершина {node}: {data['value']}, Шлях: {shortest_path}")'''
@@ -108,26 +436,418 @@ def local_optimize_graph(G, start_node):
         return None, None
 
 
+def nearest_sources(G, sources, offsets=None):
+    """
+    Один пошук від кількох початкових вершин замість окремої оптимізації для кожної: для кожної
+    вершини графа визначає мітку від найближчої початкової вершини і саму цю вершину.
+
+    Args:
+        G (CSRGraph): Граф асоціацій.
+        sources (list): ID початкових вершин.
+        offsets (list): Початкові мітки вершин sources (за замовчуванням усі 0).
+
+    Returns:
+        MultiSourceTree: Мітки, попередники та найближчі початкові вершини; шлях до вершини node
+        будується через reconstruct_path(G, tree, tree.source_of(node), node).
+    """
+    sources = [int(source) for source in sources]
+    if not sources:
+        raise ValueError("Потрібна хоча б одна початкова вершина.")
+    if offsets is None:
+        offsets = [0.0] * len(sources)
+    if len(offsets) != len(sources):
+        raise ValueError("Кількість зміщень має дорівнювати кількості початкових вершин.")
+    missing = [source for source in sources if source not in G]
+    if missing:
+        raise ValueError(f"Вершини відсутні в графі: {', '.join(map(str, missing))}")
+
+    start_indices = [G.index_of[source] for source in sources]
+    dist, pred, origin = csr_multi_source_optimization(G, start_indices, [float(offset) for offset in offsets])
+    return MultiSourceTree(G, sources, dist, pred, origin)
+
+
+# Масиви dist і pred дерева, перенесені на внутрішні індекси нового графа G
+def _remap_tree(G, all_paths):
+    old = all_paths.graph
+    dist = np.asarray(all_paths.dist, dtype=np.float64)
+    pred = np.asarray(all_paths.pred, dtype=np.int32)
+    if old is G or np.array_equal(old.ids, G.ids):
+        return dist.copy(), pred.copy()
+    position = G.index_array(old.ids)
+    kept = position >= 0
+    new_dist = np.full(G.number_of_nodes(), np.inf)
+    new_pred = np.full(G.number_of_nodes(), -1, dtype=np.int32)
+    new_dist[position[kept]] = dist[kept]
+    # Попередник, якого більше немає в графі, стає -1; така вершина далі вважається ураженою
+    new_pred[position[kept]] = np.where(pred[kept] >= 0, position[np.maximum(pred[kept], 0)], -1)
+    return new_dist, new_pred
+
+
+def repair_shortest_paths(G, all_paths, changes):
+    """
+    Оновлює дерево найкоротших шляхів після змін дуг (apply_edge_delta), не перераховуючи весь граф.
+
+    Якщо дуга дерева подовжилася або зникла, мітки її піддерева скидаються і відновлюються
+    від незачеплених сусідів; якщо дуга вкоротшала або з'явилася, покращення поширюється від
+    її кінця. Далі працює лише частина алгоритму Дейкстри для вершин, мітки яких змінилися.
+    Мітки збігаються з повним перерахунком; за рівних міток попередник може бути іншим.
+
+    Args:
+        G (CSRGraph): Граф після змін.
+        all_paths (ShortestPathTree): Дерево, обчислене для попередньої версії графа
+            (у тому числі зворотного режиму).
+        changes (pd.DataFrame): Зміни дуг з колонками Source, Target, OldWeight, NewWeight.
+
+    Returns:
+        ShortestPathTree: Дерево для G або None, якщо початкової вершини більше немає в графі.
+    """
+    if all_paths.start_node not in G:
+        return None
+    reverse = all_paths.reverse
+    start_index = G.index_of[all_paths.start_node]
+    dist, pred = _remap_tree(G, all_paths)
+
+    in_indptr, in_edges = G.csc()
+    edge_sources = G.edge_sources()
+
+    # Сусіди в напрямку поширення міток (forward) і в напрямку до кореня (backward)
+    def forward(i):
+        if reverse:
+            edges = in_edges[in_indptr[i]:in_indptr[i + 1]]
+            return zip(edge_sources[edges].tolist(), G.weight[edges].tolist())
+        start, end = G.indptr[i], G.indptr[i + 1]
+        return zip(G.indices[start:end].tolist(), G.weight[start:end].tolist())
+
+    def backward(i):
+        if reverse:
+            start, end = G.indptr[i], G.indptr[i + 1]
+            return zip(G.indices[start:end].tolist(), G.weight[start:end].tolist())
+        edges = in_edges[in_indptr[i]:in_indptr[i + 1]]
+        return zip(edge_sources[edges].tolist(), G.weight[edges].tolist())
+
+    # Кінці змінених дуг у напрямку дерева: u - ближче до кореня
+    u = G.index_array(changes['Target'] if reverse else changes['Source'])
+    v = G.index_array(changes['Source'] if reverse else changes['Target'])
+    old_weight = changes['OldWeight'].to_numpy(dtype=np.float64)
+    new_weight = changes['NewWeight'].to_numpy(dtype=np.float64)
+    valid = (u >= 0) & (v >= 0)
+
+    # Корені уражених піддерев: дуги дерева, що подовжилися, та вершини, які втратили попередника
+    lengthened = valid & (new_weight > old_weight)
+    roots = v[lengthened][pred[v[lengthened]] == u[lengthened]]
+    orphans = np.flatnonzero((pred < 0) & np.isfinite(dist))
+    roots = np.union1d(roots, orphans[orphans != start_index])
+
+    affected = np.zeros(G.number_of_nodes(), dtype=bool)
+    if len(roots):
+        order = np.argsort(pred, kind='stable')
+        first = np.searchsorted(pred[order], np.arange(G.number_of_nodes()))
+        last = np.searchsorted(pred[order], np.arange(G.number_of_nodes()), side='right')
+        stack = roots.tolist()
+        while stack:
+            i = stack.pop()
+            if affected[i]:
+                continue
+            affected[i] = True
+            stack.extend(order[first[i]:last[i]].tolist())
+        dist[affected] = np.inf
+        pred[affected] = -1
+
+    heap = []
+    # Уражені вершини отримують найкращу мітку від незачеплених сусідів
+    for i in np.flatnonzero(affected).tolist():
+        for j, w in backward(i):
+            if not affected[j] and dist[j] + w < dist[i]:
+                dist[i] = dist[j] + w
+                pred[i] = j
+        if dist[i] < np.inf:
+            heap.append((float(dist[i]), i))
+    # Дуги, що вкоротшали або з'явилися
+    shortened = valid & (new_weight < old_weight)
+    for i, j, w in zip(u[shortened].tolist(), v[shortened].tolist(), new_weight[shortened].tolist()):
+        if dist[i] + w < dist[j]:
+            dist[j] = dist[i] + w
+            pred[j] = i
+            heap.append((float(dist[j]), j))
+    heapq.heapify(heap)
+
+    while heap:
+        value, i = heapq.heappop(heap)
+        if value > dist[i]:
+            continue
+        for j, w in forward(i):
+            new_value = value + w
+            if new_value < dist[j]:
+                dist[j] = new_value
+                pred[j] = i
+                heapq.heappush(heap, (new_value, j))
+    return ShortestPathTree(G, all_paths.start_node, dist, pred, reverse=reverse)
+
+
+# Пошук від початкової вершини, що зупиняється, щойно встановлено мітку кінцевої
+# blocked_nodes і blocked_edges (пари індексів) виключаються з пошуку - потрібно для k найкоротших шляхів
+def _forward_search(G, start_index, end_index, blocked_nodes=(), blocked_edges=()):
+    indptr, indices, weight = G.indptr, G.indices, G.weight
+    dist = {start_index: 0.0}
+    pred = {start_index: -1}
+    settled = set()
+    heap = [(0.0, start_index)]
+    found = False
+    while heap:
+        value, i = heapq.heappop(heap)
+        if i in settled:
+            continue
+        if i == end_index:
+            found = True
+            break
+        settled.add(i)
+        start, end = indptr[i], indptr[i + 1]
+        for j, w in zip(indices[start:end].tolist(), weight[start:end].tolist()):
+            if j in blocked_nodes or (i, j) in blocked_edges:
+                continue
+            new_value = value + w
+            if new_value < dist.get(j, float('inf')):
+                dist[j] = new_value
+                pred[j] = i
+                heapq.heappush(heap, (new_value, j))
+    _count('point_to_point', relaxations=np.diff(indptr)[list(settled)].sum(), nodes_settled=len(settled))
+    return _chain(pred, end_index)[::-1] if found else None
+
+
+# Пошук A*: купа впорядкована за міткою плюс нижньою оцінкою відстані до кінцевої вершини (bounds)
+def _astar_search(G, start_index, end_index, bounds):
+    indptr, indices, weight = G.indptr, G.indices, G.weight
+    bounds = bounds.tolist()
+    if bounds[start_index] == float('inf'):
+        return None
+    dist = {start_index: 0.0}
+    pred = {start_index: -1}
+    settled = set()
+    heap = [(bounds[start_index], 0.0, start_index)]
+    found = False
+    while heap:
+        _, value, i = heapq.heappop(heap)
+        if i in settled:
+            continue
+        if i == end_index:
+            found = True
+            break
+        settled.add(i)
+        start, end = indptr[i], indptr[i + 1]
+        for j, w in zip(indices[start:end].tolist(), weight[start:end].tolist()):
+            new_value = value + w
+            # Вершини з нескінченною оцінкою не можуть досягти кінцевої
+            if new_value < dist.get(j, float('inf')) and bounds[j] < float('inf'):
+                dist[j] = new_value
+                pred[j] = i
+                heapq.heappush(heap, (new_value + bounds[j], new_value, j))
+    _count('astar', relaxations=np.diff(indptr)[list(settled)].sum(), nodes_settled=len(settled))
+    return _chain(pred, end_index)[::-1] if found else None
+
+
+# Двонапрямлений пошук: вперед за вихідними дугами і назад за вхідними (CSC) одночасно
+def _bidirectional_search(G, start_index, end_index):
+    if start_index == end_index:
+        return [start_index]
+
+    in_indptr, in_edges = G.csc()
+    edge_sources = G.edge_sources()
+    dist = ({start_index: 0.0}, {end_index: 0.0})
+    pred = ({start_index: -1}, {end_index: -1})
+    settled = (set(), set())
+    heaps = ([(0.0, start_index)], [(0.0, end_index)])
+    best, meeting = float('inf'), None
+
+    while heaps[0] and heaps[1]:
+        # Жоден ще не встановлений шлях не може бути коротшим за знайдений
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        value, i = heapq.heappop(heaps[side])
+        if i in settled[side]:
+            continue
+        settled[side].add(i)
+
+        if side == 0:
+            start, end = G.indptr[i], G.indptr[i + 1]
+            neighbours = zip(G.indices[start:end].tolist(), G.weight[start:end].tolist())
+        else:
+            edges = in_edges[in_indptr[i]:in_indptr[i + 1]]
+            neighbours = zip(edge_sources[edges].tolist(), G.weight[edges].tolist())
+
+        other_dist = dist[1 - side]
+        for j, w in neighbours:
+            new_value = value + w
+            if new_value < dist[side].get(j, float('inf')):
+                dist[side][j] = new_value
+                pred[side][j] = i
+                heapq.heappush(heaps[side], (new_value, j))
+            if j in other_dist and new_value + other_dist[j] < best:
+                best = new_value + other_dist[j]
+                # Дуга зустрічі (u, v): u - у прямому дереві, v - у зворотному
+                meeting = (i, j) if side == 0 else (j, i)
+
+    _count('bidirectional', nodes_settled=len(settled[0]) + len(settled[1]),
+           relaxations=np.diff(G.indptr)[list(settled[0])].sum() + np.diff(in_indptr)[list(settled[1])].sum())
+    if meeting is None:
+        return None
+    u, v = meeting
+    return _chain(pred[0], u)[::-1] + _chain(pred[1], v)
+
+
+# Ланцюжок вершин від node назад до кореня дерева попередників
+def _chain(pred, node):
+    chain = []
+    while node != -1:
+        chain.append(node)
+        node = pred[node]
+    return chain
+
+
+# Найкоротший шлях між двома вершинами CSRGraph без обчислення міток усього графа
+def shortest_path(G, source, target, bidirectional=False, landmarks=None):
+    """
+    Шукає шлях від source до target, зупиняючись, щойно мітку target встановлено.
+
+    Args:
+        G (CSRGraph): Граф асоціацій.
+        source (int): ID початкової вершини.
+        target (int): ID кінцевої вершини.
+        bidirectional (bool): Вести пошук одночасно з обох кінців.
+        landmarks (LandmarkIndex): Індекс орієнтирів графа G; якщо задано, виконується пошук A*
+            з нижніми оцінками за нерівністю трикутника (ALT), а bidirectional ігнорується.
+
+    Returns:
+        list: Шлях у форматі reconstruct_path: ["ID (Value: x)", ...]. Якщо шляху немає -
+        лише початкова вершина.
+    """
+    start_index = G.index_of[source]
+    end_index = G.index_of[target]
+    if landmarks is not None:
+        chain = _astar_search(G, start_index, end_index, landmarks.lower_bounds(end_index))
+    else:
+        search = _bidirectional_search if bidirectional else _forward_search
+        chain = search(G, start_index, end_index)
+    if chain is None or len(chain) == 1:
+        return [f"{source} (Value: 0)"]
+
+    return _path_with_values(G, chain)
+
+
+# Шлях від кореня дерева до end_index за масивом попередників (внутрішні індекси), без міток дерева
+def path_from_pred(G, pred, end_index):
+    if pred[end_index] < 0:
+        return None
+    return _path_with_values(G, _chain(pred, end_index)[::-1])
+
+
+# Шлях у форматі reconstruct_path за ланцюжком внутрішніх індексів вершин
+def _path_with_values(G, chain):
+    # Мітки вершин - накопичені ваги дуг вздовж шляху, як у повній оптимізації
+    positions = G.edge_positions(G.ids[chain[:-1]], G.ids[chain[1:]])
+    path = [f"{int(G.ids[chain[0]])} (Value: 0)"]
+    value = 0.0
+    for node, pos in zip(G.ids[chain[1:]].tolist(), positions.tolist()):
+        value += float(G.weight[pos])
+        path.append(f"{node} (Value: {round(value, 2)})")
+    return path
+
+
+# Сума ваг дуг вздовж ланцюжка внутрішніх індексів вершин
+def _chain_cost(G, chain):
+    positions = G.edge_positions(G.ids[chain[:-1]], G.ids[chain[1:]])
+    return sum(G.weight[positions].tolist())
+
+
+def k_shortest_paths(G, source, target, k, all_paths=None):
+    """
+    До k найкоротших шляхів без повторення вершин від source до target (алгоритм Єна).
+
+    Перший шлях береться з дерева all_paths, якщо його вже обчислено для source (наприклад,
+    з кешу), інакше знаходиться пошуком між двома вершинами. Кожен наступний шлях - найкоротше
+    відхилення від уже знайдених: для кожної вершини попереднього шляху виконується пошук,
+    з якого виключено вершини спільного початку та дуги, якими цей початок уже продовжувався.
+
+    Args:
+        G (CSRGraph): Граф асоціацій.
+        source (int): ID початкової вершини.
+        target (int): ID кінцевої вершини.
+        k (int): Найбільша кількість шляхів.
+        all_paths (ShortestPathTree): Дерево найкоротших шляхів від source (необов'язково).
+
+    Returns:
+        list: Шляхи у форматі reconstruct_path за зростанням сумарної ваги; порожній, якщо шляху немає.
+    """
+    start_index = G.index_of[source]
+    end_index = G.index_of[target]
+    if start_index == end_index:
+        return [[f"{source} (Value: 0)"]]
+
+    if isinstance(all_paths, ShortestPathTree) and not all_paths.reverse and all_paths.start_index == start_index:
+        first = None if all_paths.pred[end_index] < 0 else _chain(all_paths.pred, end_index)[::-1]
+    else:
+        first = _forward_search(G, start_index, end_index)
+    if first is None:
+        return []
+
+    found = [first]
+    candidates = []
+    seen = {tuple(first)}
+    while len(found) < k:
+        previous = found[-1]
+        for i in range(len(previous) - 1):
+            root = previous[:i + 1]
+            blocked_edges = {(path[i], path[i + 1]) for path in found if path[:i + 1] == root}
+            spur = _forward_search(G, root[-1], end_index, set(root[:-1]), blocked_edges)
+            if spur is None:
+                continue
+            candidate = root[:-1] + spur
+            if tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates, (_chain_cost(G, candidate), candidate))
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[1])
+    return [_path_with_values(G, chain) for chain in found]
+
+
 import csv
 import pandas as pd
 
 
-def load_into_csv(G, output_file):
-    try:
+# Рядки файлу відображення (слово, мітка), відсортовані за словом
+def mapping_rows(G, all_paths=None):
+    if isinstance(G, CSRGraph) and isinstance(all_paths, ShortestPathTree):
+        # Мітки беруться прямо з масиву dist, слова - з таблиці слів графа
+        words = [str(node) if name is None else name for node, name in zip(G.ids.tolist(), G.names.tolist())]
+        values = [round(value, 3) for value in all_paths.dist.tolist()]
+        if all_paths.start_index is not None:
+            values[all_paths.start_index] = 0
+        graph_data = list(zip(words, values))
+    else:
         nodes_file = 'csvs/nodes12_list.csv'  # Path to the file containing node names
         with open(nodes_file, 'r', encoding='utf-8') as nf:
             node_df = pd.read_csv(nf)
 
-        node_id_to_name = {row['Id']: row['Name'] for index, row in node_df.iterrows()}
+        node_id_to_name = dict(zip(node_df['Id'], node_df['Name']))
 
         graph_data = []
-        for node in G.nodes(data=True):
-            word = node_id_to_name.get(node[0], str(node[0]))  # Use the ID if the name is not found
-            value = round(node[1].get('value', 0), 3)
+        for node in G.nodes():
+            word = node_id_to_name.get(node, str(node))  # Use the ID if the name is not found
+            if isinstance(all_paths, ShortestPathTree):
+                value = round(all_paths.value(node), 3)
+            else:
+                value = round(G.nodes[node].get('value', 0), 3)
             graph_data.append((word, value))
 
-        # Sort the data by word
-        graph_data.sort(key=lambda x: x[0])
+    # Sort the data by word
+    graph_data.sort(key=lambda x: x[0])
+    return graph_data
+
+
+def load_into_csv(G, output_file, all_paths=None):
+    try:
+        graph_data = mapping_rows(G, all_paths)
 
         with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
             csvwriter = csv.writer(csvfile)
@@ -0,0 +1,78 @@
+import csv
+import gzip
+import io
+import zipfile
+import pandas as pd
+
+
+# Формати вивантаження розмітки: ім'я файлу та MIME-тип відповіді
+MAPPING_FORMATS = {
+    'csv': ('mapping.zip', 'application/zip'),
+    'csv.gz': ('mapping.csv.gz', 'application/gzip'),
+    'parquet': ('mapping.parquet', 'application/vnd.apache.parquet'),
+}
+CHUNK_ROWS = 1000
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Потік лише для запису, з якого генератор забирає накопичені байти частинами."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# Текстовий CSV поверх байтового потоку; рядки пишуться частинами по CHUNK_ROWS
+def _write_csv_chunks(stream, buffer, rows):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(['Word', 'Value'])
+    for start in range(0, len(rows), CHUNK_ROWS):
+        writer.writerows(rows[start:start + CHUNK_ROWS])
+        yield buffer.take()
+    text.detach()
+
+
+def stream_mapping(rows, mapping_format='csv'):
+    """
+    Генерує байти файлу розмітки (слово, мітка) без тимчасових файлів на диску.
+
+    Args:
+        rows (list): Рядки (слово, мітка), наприклад з mapping_rows.
+        mapping_format (str): 'csv' (zip-архів з mapping.csv), 'csv.gz' або 'parquet'.
+
+    Yields:
+        bytes: Послідовні частини файлу для потокової відповіді.
+    """
+    buffer = _ChunkBuffer()
+
+    if mapping_format == 'csv':
+        # ZipFile уміє писати в потік без пошуку (seek), тож архів віддається частинами
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            with zipf.open('mapping.csv', 'w') as entry:
+                yield from _write_csv_chunks(entry, buffer, rows)
+        yield buffer.take()
+    elif mapping_format == 'csv.gz':
+        with gzip.GzipFile(filename='mapping.csv', mode='wb', fileobj=buffer) as gz:
+            yield from _write_csv_chunks(gz, buffer, rows)
+        yield buffer.take()
+    elif mapping_format == 'parquet':
+        # Parquet записується цілим блоком (потрібен pyarrow або fastparquet)
+        frame = pd.DataFrame(rows, columns=['Word', 'Value'])
+        frame['Value'] = frame['Value'].astype(float)
+        data = io.BytesIO()
+        frame.to_parquet(data, index=False)
+        yield data.getvalue()
+    else:
+        raise ValueError(f"Невідомий формат розмітки: {mapping_format}. Доступні: {', '.join(MAPPING_FORMATS)}")
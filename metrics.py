@@ -0,0 +1,113 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Межі кошиків гістограм тривалості (секунди), як за замовчуванням у клієнтах Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гістограма тривалостей з фіксованими кошиками, сумою та кількістю спостережень."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Мітки метрики у форматі Prometheus: {name="value",...}
+def _labels(**labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """
+    Метрики веб-застосунку в пам'яті процесу: тривалість етапів обробки запиту, тривалість
+    і кількість запитів за маршрутом. Кожен процес-обробник має власний реєстр.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._requests = {}
+        self._responses = {}
+
+    # Вимірювання тривалості етапу: with registry.stage('opt_path_to_json'): ...
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - start)
+
+    def observe_stage(self, name, seconds):
+        with self._lock:
+            self._stages.setdefault(name, Histogram()).observe(seconds)
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            self._requests.setdefault((endpoint, method), Histogram()).observe(seconds)
+            key = (endpoint, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def render(self, counters=None, gauges=None):
+        """
+        Текстовий формат експозиції Prometheus.
+
+        Args:
+            counters (dict): Додаткові лічильники {назва: [(мітки (dict), значення), ...]}.
+            gauges (dict): Додаткові поточні значення у тому самому форматі.
+
+        Returns:
+            str: Текст для відповіді /metrics.
+        """
+        lines = []
+        with self._lock:
+            self._render_histograms(lines, 'web_request_duration_seconds', 'Request latency by endpoint.',
+                                    {_labels(endpoint=endpoint, method=method): histogram
+                                     for (endpoint, method), histogram in self._requests.items()})
+            lines.append('# HELP web_requests_total Requests by endpoint and status code.')
+            lines.append('# TYPE web_requests_total counter')
+            for (endpoint, method, status), value in sorted(self._responses.items()):
+                lines.append(f'web_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {value}')
+            self._render_histograms(lines, 'web_stage_duration_seconds', 'Duration of request processing stages.',
+                                    {_labels(stage=name): histogram for name, histogram in self._stages.items()})
+
+        for kind, metrics in (('counter', counters or {}), ('gauge', gauges or {})):
+            for name, samples in metrics.items():
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(**labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, description, histograms):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, histogram in sorted(histograms.items()):
+            # Кошики Prometheus накопичувальні; le підставляється в кінець набору міток
+            prefix = labels[:-1] + ',' if labels else '{'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{labels} {histogram.sum}')
+            lines.append(f'{name}_count{labels} {histogram.count}')
+
+
+# Спільний реєстр веб-застосунку
+registry = MetricsRegistry()
+stage = registry.stage
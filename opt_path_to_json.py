@@ -1,6 +1,8 @@
 import json
+import os
 import pandas as pd
 from word_checker import get_label_by_id
+from graph_core import build_csr_graph
 
 
 def update_label(label, value):
@@ -31,45 +33,92 @@ def update_edge_label(label, weight):
     return f"{label} | вага = {weight:.1f}"
 
 
-def get_edge_properties(file_path, source_id, target_id):
+_edge_graphs = {}
+
+
+def load_edge_graph(file_path):
     """
-    Отримує властивості weight та label для ребра з CSV файлу на основі source_id та target_id.
+    Повертає CSRGraph для CSV файлу з ребрами, будуючи його лише при першому зверненні
+    або після зміни файлу.
 
     Args:
         file_path (str): Шлях до CSV файлу з даними про ребра.
-        source_id (str): ID початкового вузла ребра.
-        target_id (str): ID кінцевого вузла ребра.
 
     Returns:
-        dict: Словник з властивостями weight та label для ребра.
+        CSRGraph: Граф, що слугує індексом (source, target) -> ребро, або None при помилці.
     """
     try:
-        df = pd.read_csv(file_path, encoding='utf-8')
+        mtime = os.path.getmtime(file_path)
+        cached = _edge_graphs.get(file_path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, build_csr_graph(pd.read_csv(file_path, encoding='utf-8'), nodes_file=None))
+            _edge_graphs[file_path] = cached
+        return cached[1]
     except Exception as e:
         print("Помилка при читанні CSV файлу:", e)
         return None
 
-    edge = df[(df['Source'] == int(source_id)) & (df['Target'] == int(target_id))]
 
-    if not edge.empty:
-        weight = edge.iloc[0]['Weight']
-        label = edge.iloc[0]['Label']
-        updated_label = update_edge_label(label, weight)
-        return {"weight": weight, "label": updated_label}
-    else:
-        print(f"Властивості для ребра від {source_id} до {target_id} не знайдені.")
-        return {"weight": None, "label": None}
+def get_path_edge_properties(graph, node_ids):
+    """
+    Отримує властивості weight та label для всіх ребер шляху за один прохід по індексу ребер.
 
+    Args:
+        graph (CSRGraph): Завантажений граф.
+        node_ids (list): ID вузлів шляху у порядку проходження.
 
-def opt_path_to_json(path, csv_file_path='csvs/nodes12_list.csv', edge_file_path='csvs/cue1_response2_str_filtered_ROOT.csv', json_file_path='jsons/optimized_path.json'):
+    Returns:
+        list: Словники з властивостями weight та label для кожної пари сусідніх вузлів.
+    """
+    sources = [int(node_id) for node_id in node_ids[:-1]]
+    targets = [int(node_id) for node_id in node_ids[1:]]
+    positions = graph.edge_positions(sources, targets)
+
+    properties = []
+    for source_id, target_id, pos in zip(sources, targets, positions.tolist()):
+        if pos < 0:
+            print(f"Властивості для ребра від {source_id} до {target_id} не знайдені.")
+            properties.append({"weight": None, "label": None})
+            continue
+        weight = float(graph.weight[pos])
+        label = f"{graph.r[pos]} / {graph.n[pos]}"
+        properties.append({"weight": weight, "label": update_edge_label(label, weight)})
+    return properties
+
+
+def get_edge_properties(file_path, source_id, target_id, graph=None):
     """
-    Зберігає даний шлях, розділений на вузли та ребра, у JSON файл з мітками вузлів з CSV файлу.
+    Отримує властивості weight та label для ребра на основі source_id та target_id.
+
+    Args:
+        file_path (str): Шлях до CSV файлу з даними про ребра (якщо graph не задано).
+        source_id (str): ID початкового вузла ребра.
+        target_id (str): ID кінцевого вузла ребра.
+        graph (CSRGraph): Вже завантажений граф, що використовується як індекс ребер.
+
+    Returns:
+        dict: Словник з властивостями weight та label для ребра.
+    """
+    if graph is None:
+        graph = load_edge_graph(file_path)
+        if graph is None:
+            return None
+    return get_path_edge_properties(graph, [source_id, target_id])[0]
+
+
+def opt_path_to_json(path, csv_file_path='csvs/nodes12_list.csv', edge_file_path='csvs/cue1_response2_str_filtered_ROOT.csv', json_file_path='jsons/optimized_path.json', graph=None):
+    """
+    Перетворює даний шлях на вузли та ребра з мітками вузлів з CSV файлу і, за потреби, зберігає у JSON файл.
 
     Args:
         path (list): Шлях для збереження, зазвичай список рядків вузлів з асоційованими значеннями.
         csv_file_path (str): Шлях до CSV файлу, що містить ID та мітки вузлів.
         edge_file_path (str): Шлях до CSV файлу, що містить дані про ребра.
-        json_file_path (str): Шлях до JSON файлу, куди мають бути збережені дані.
+        json_file_path (str): Шлях до JSON файлу, куди мають бути збережені дані; None - не зберігати.
+        graph (CSRGraph): Вже завантажений граф; якщо не задано, індекс ребер будується з edge_file_path.
+
+    Returns:
+        dict: Дані шляху {"nodes": [...], "edges": [...]}.
     """
     nodes = []
     edges = []
@@ -84,12 +133,14 @@ def opt_path_to_json(path, csv_file_path='csvs/nodes12_list.csv', edge_file_path
         is_corner = i == 0 or i == len(path) - 1  # Першій та останній вершинам встановлюємо is_corner=True
         nodes.append({"key": node_id, "value": value_float, "label": updated_label, "is_corner": is_corner})
 
-    # Витягуємо ребра на основі послідовних вузлів та отримуємо їх властивості з CSV
-    for i in range(len(path) - 1):
-        from_node = path[i].split(" (")[0]
-        to_node = path[i + 1].split(" (")[0]
-        edge_props = get_edge_properties(edge_file_path, from_node, to_node)
-        edges.append({"from": from_node, "to": to_node, "weight": edge_props["weight"], "label": edge_props["label"]})
+    # Витягуємо ребра на основі послідовних вузлів та отримуємо їх властивості з індексу ребер
+    node_ids = [node.split(" (")[0] for node in path]
+    if graph is None:
+        graph = load_edge_graph(edge_file_path)
+    if len(node_ids) > 1 and graph is not None:
+        edge_props = get_path_edge_properties(graph, node_ids)
+        for from_node, to_node, props in zip(node_ids[:-1], node_ids[1:], edge_props):
+            edges.append({"from": from_node, "to": to_node, "weight": props["weight"], "label": props["label"]})
 
     # Підготовлюємо дані для збереження
     data = {
@@ -98,12 +149,14 @@ def opt_path_to_json(path, csv_file_path='csvs/nodes12_list.csv', edge_file_path
     }
 
     # Записуємо дані в JSON файл
-    try:
-        with open(json_file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
-        print("Шлях успішно збережений в", json_file_path)
-    except IOError as e:
-        print("Помилка при записі до файлу:", e)
+    if json_file_path is not None:
+        try:
+            with open(json_file_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False, indent=4)
+            print("Шлях успішно збережений в", json_file_path)
+        except IOError as e:
+            print("Помилка при записі до файлу:", e)
+    return data
 
 
 '''path_example = ['406 (Value: 0)', '760 (Value: 18.545454545454547)', '697 (Value: 29.177033492822964)', '233 (Value: 36.177033492822964)', '124 (Value: 58.51036682615629)', '405 (Value: 76.09370015948963)']
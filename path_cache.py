@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from graph_core import edge_weight_changes
+from local_optimization import local_optimize_graph, repair_shortest_paths, ShortestPathTree, ARRAY_ENGINES, DEFAULT_ENGINE
+
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+# Найменший цілий тип, у який вміщуються індекси попередників (та -1)
+def compact_index_dtype(number_of_nodes):
+    return np.int16 if number_of_nodes < np.iinfo(np.int16).max else np.int32
+
+
+class ShortestPathCache:
+    """
+    Обмежений кеш результатів оптимізації CSRGraph за початковою вершиною.
+
+    Для кожної вершини зберігаються лише масив міток (float64) і масив попередників
+    у найменшому цілому типі. Коли сумарний розмір перевищує max_bytes, витісняються
+    записи, до яких найдовше не зверталися (LRU). Кеш із reverse=True зберігає результати
+    зворотного режиму (мітки від усіх вершин до заданої).
+    """
+
+    def __init__(self, graph, max_bytes=DEFAULT_MAX_BYTES, engine=DEFAULT_ENGINE, reverse=False):
+        self.graph = graph
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.reverse = reverse
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, start_node):
+        return int(start_node) in self._entries
+
+    # Дерево найкоротших шляхів від start_node; обчислюється лише при промаху
+    def get(self, start_node):
+        key = int(start_node)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return ShortestPathTree(self.graph, key, *entry, reverse=self.reverse)
+            self.misses += 1
+            graph = self.graph
+
+        _, tree = local_optimize_graph(graph, key, engine=self.engine, reverse=self.reverse)
+        if tree is None:
+            return None
+        self.put(key, tree.dist, tree.pred, graph)
+        return tree
+
+    # Масиви запису кешу: мітки float64 і попередники у найменшому цілому типі
+    @staticmethod
+    def _entry(dist, pred):
+        return (np.asarray(dist, dtype=np.float64), np.asarray(pred).astype(compact_index_dtype(len(dist))))
+
+    # Найновіший запис лишається, навіть якщо сам перевищує ліміт (викликається під self._lock)
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (old_dist, old_pred) = self._entries.popitem(last=False)
+            self._bytes -= old_dist.nbytes + old_pred.nbytes
+            self.evictions += 1
+
+    # Збереження готових масивів dist і pred для вершини. Якщо задано graph (граф, для якого їх обчислено),
+    # а кеш тим часом перейшов на іншу версію графа (apply_delta), масиви не зберігаються
+    def put(self, start_node, dist, pred, graph=None):
+        key = int(start_node)
+        entry = self._entry(dist, pred)
+        with self._lock:
+            if graph is not None and graph is not self.graph:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0].nbytes + previous[1].nbytes
+            self._entries[key] = entry
+            self._bytes += entry[0].nbytes + entry[1].nbytes
+            self._evict()
+
+    # Перехід на нову версію графа: кешовані дерева оновлюються repair_shortest_paths, а не скидаються.
+    # Кеш лишається у своїй схемі ваг; changes - зміни ваг саме цієї схеми (без них обчислюються тут).
+    # Поки дерева відновлюються, кеш віддає старі дерева старого графа; новий граф і відновлені
+    # дерева встановлюються разом, а дерева, які відновити не вдалося, зникають з кешу
+    def apply_delta(self, graph, changes=None):
+        with self._lock:
+            old_graph, entries = self.graph, list(self._entries.items())
+        graph = graph.with_weight(old_graph.scheme)
+        if changes is None:
+            changes = edge_weight_changes(old_graph, graph)
+        repaired = OrderedDict()
+        for key, (dist, pred) in entries:
+            tree = repair_shortest_paths(graph, ShortestPathTree(old_graph, key, dist, pred, reverse=self.reverse), changes)
+            if tree is not None:
+                repaired[key] = self._entry(tree.dist, tree.pred)
+        with self._lock:
+            self.graph = graph
+            self._entries = repaired
+            self._bytes = sum(dist.nbytes + pred.nbytes for dist, pred in repaired.values())
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # Лічильники для моніторингу
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class AllPairsStore:
+    """
+    Мітки та попередники для всіх пар вершин невеликого графа (наприклад, демонстраційного
+    підграфа), обчислені один раз повторним запуском однаджерельного рушія з кожної вершини.
+    """
+
+    def __init__(self, graph, engine=DEFAULT_ENGINE):
+        self.graph = graph
+        size = graph.number_of_nodes()
+        self.dist = np.empty((size, size), dtype=np.float64)
+        self.pred = np.empty((size, size), dtype=compact_index_dtype(size))
+        for i in range(size):
+            self.dist[i], self.pred[i] = ARRAY_ENGINES[engine](graph, i)
+
+    # Дерево найкоротших шляхів від start_node - подання рядків матриць без копіювання
+    def tree(self, start_node):
+        i = self.graph.index_of[start_node]
+        return ShortestPathTree(self.graph, start_node, self.dist[i], self.pred[i])
+
+    def distance(self, start_node, end_node):
+        return float(self.dist[self.graph.index_of[start_node], self.graph.index_of[end_node]])
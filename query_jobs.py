@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from local_optimization import ARRAY_ENGINES, DEFAULT_ENGINE, ShortestPathTree, optimizer_counters, \
+    merge_optimizer_counters
+from worker_pool import graph_process_pool, worker_graph
+
+
+# Найбільша кількість різних обчислень, що одночасно очікують або виконуються в пулі
+DEFAULT_MAX_PENDING = 64
+# Кількість завершених завдань, результати яких ще можна отримати
+DEFAULT_KEEP_FINISHED = 256
+# Кількість потоків, що зберігають дерева і формують результати завдань
+FINISH_THREADS = 2
+
+
+# Мітки, попередники від source для схеми ваг weight і приріст лічильників рушія за цей пошук
+# (виконується у процесі пулу, тож лічильники треба повернути батьківському процесу)
+def _optimize_in_worker(source, weight, engine):
+    graph = worker_graph().with_weight(weight)
+    before = Counter(optimizer_counters)
+    dist, pred = ARRAY_ENGINES[engine](graph, graph.index_of[source])
+    return dist, pred, Counter(optimizer_counters) - before
+
+
+class JobQueue:
+    """
+    Фонові завдання оптимізації: дерево найкоротших шляхів від source для схеми ваг weight
+    обчислюється в обмеженому пулі процесів, а запит одразу отримує ID завдання.
+
+    Завдання з однаковими (source, weight), що надходять, поки обчислення ще триває, не запускають
+    нового пошуку, а чекають на вже наявний. Коли дерево готове, воно передається у store (наприклад,
+    у кеш результатів), а для кожного завдання викликається його finish(tree), який формує результат.
+    Ця робота виконується в окремому невеликому пулі потоків, а не в потоці, що отримує результати з
+    пулу процесів, тому повільний finish не затримує завершення інших обчислень.
+    """
+
+    def __init__(self, graph, store=None, max_workers=None, max_pending=DEFAULT_MAX_PENDING,
+                 keep_finished=DEFAULT_KEEP_FINISHED, engine=DEFAULT_ENGINE):
+        self.graph = graph
+        self.store = store
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.engine = engine
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.failed = 0
+        # Номер версії графа: зростає з кожним replace_graph
+        self.graph_version = 0
+        self._executor = None
+        self._finisher = ThreadPoolExecutor(max_workers=FINISH_THREADS, thread_name_prefix='job-finish')
+        self._jobs = OrderedDict()
+        # (source, weight, версія графа) -> (future, ID завдань, що на нього чекають, граф обчислення)
+        self._inflight = {}
+        self._changed = threading.Condition()
+
+    # Пул створюється під час першого завдання, щоб синхронний режим не запускав зайвих процесів
+    def _pool(self):
+        if self._executor is None:
+            self._executor = graph_process_pool(self.graph, self.max_workers)
+        return self._executor
+
+    # Пул процесів завдань разом із графом його процесів. Ним користуються й інші обчислення над тим
+    # самим графом (наприклад, /batch_paths), щоб кількість процесів сервера лишалася обмеженою
+    def executor(self):
+        with self._changed:
+            return self._pool(), self.graph
+
+    def submit(self, source, weight, finish):
+        """
+        Ставить завдання в чергу.
+
+        Args:
+            source (int): ID початкової вершини.
+            weight (str): Схема ваг з WEIGHT_SCHEMES.
+            finish (callable): finish(tree) -> dict, результат завдання за деревом ShortestPathTree.
+
+        Returns:
+            str: ID завдання.
+
+        Raises:
+            RuntimeError: Черга заповнена (max_pending різних обчислень).
+        """
+        job_id = uuid.uuid4().hex
+        with self._changed:
+            key = (int(source), weight, self.graph_version)
+            job = {"job_id": job_id, "source": key[0], "weight": weight, "graph_version": key[2], "state": "queued",
+                   "submitted": time.time(), "finished": None, "result": None, "error": None, "finish": finish}
+            inflight = self._inflight.get(key)
+            if inflight is None and len(self._inflight) >= self.max_pending:
+                self.rejected += 1
+                raise RuntimeError(f"Черга завдань заповнена ({self.max_pending}), спробуйте пізніше.")
+            self._jobs[job_id] = job
+            self.submitted += 1
+            if inflight is not None:
+                self.deduplicated += 1
+                inflight[1].append(job_id)
+            else:
+                future = self._pool().submit(_optimize_in_worker, key[0], weight, self.engine)
+                self._inflight[key] = (future, [job_id], self.graph)
+                future.add_done_callback(lambda future, key=key: self._complete(key, future))
+        return job_id
+
+    # Завершення обчислення (потік пулу процесів): подальша робота передається потокам завершення
+    def _complete(self, key, future):
+        try:
+            self._finisher.submit(self._finish, key, future)
+        except RuntimeError as e:
+            # Пул потоків уже зупинено (shutdown)
+            with self._changed:
+                _, job_ids, _ = self._inflight.pop(key)
+            self._fail(job_ids, e)
+
+    # Дерево зберігається, лічильники процесу пулу додаються до лічильників сервера, а результат
+    # передається всім завданням, що його чекали; будь-яка помилка стає станом failed цих завдань.
+    # Дерево графа, заміненого під час обчислення, лише завершує свої завдання і не зберігається
+    def _finish(self, key, future):
+        with self._changed:
+            _, job_ids, graph = self._inflight.pop(key)
+            current = key[2] == self.graph_version
+        try:
+            dist, pred, counters = future.result()
+            merge_optimizer_counters(counters)
+            tree = ShortestPathTree(graph.with_weight(key[1]), key[0], dist, pred)
+        except Exception as e:
+            self._fail(job_ids, e)
+            return
+        if self.store is not None and current:
+            try:
+                self.store(key[1], tree)
+            except Exception as e:
+                print(f"Не вдалося зберегти результат завдання: {e}")
+        for job_id in job_ids:
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            try:
+                result, error = job["finish"](tree), None
+            except Exception as e:
+                result, error = None, str(e)
+            with self._changed:
+                job.update(state="done" if error is None else "failed", result=result, error=error,
+                           finished=time.time(), finish=None)
+                self.failed += error is not None
+                self._changed.notify_all()
+        self._evict_finished()
+
+    def _fail(self, job_ids, error):
+        with self._changed:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.update(state="failed", error=str(error), finished=time.time(), finish=None)
+                    self.failed += 1
+            self._changed.notify_all()
+        self._evict_finished()
+
+    # Найстаріші завершені завдання видаляються, коли їх більше за keep_finished
+    def _evict_finished(self):
+        with self._changed:
+            finished = [job_id for job_id, job in self._jobs.items() if job["finished"] is not None]
+            for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Стан завдання: queued, running, done або failed.
+
+        Returns:
+            dict: Копія запису завдання (без finish) або None, якщо ID невідомий чи завдання вже видалено.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = {name: value for name, value in job.items() if name != "finish"}
+            inflight = self._inflight.get((job["source"], job["weight"], job["graph_version"]))
+            if job["state"] == "queued" and inflight is not None and inflight[0].running():
+                job["state"] = "running"
+            return job
+
+    # Очікування зміни стану завдання (не довше за timeout секунд); для потоку server-sent events
+    def wait(self, job_id, state=None, timeout=15.0):
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self.get(job_id)
+                if job is None or job["state"] != state or job["finished"] is not None:
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return job
+                self._changed.wait(min(remaining, 1.0))
+
+    # Лічильники для моніторингу
+    def stats(self):
+        with self._changed:
+            states = [self.get(job_id)["state"] for job_id in self._jobs]
+            return {
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "queued": states.count("queued"),
+                "running": states.count("running"),
+                "done": states.count("done"),
+                "inflight": len(self._inflight),
+                "max_pending": self.max_pending,
+                "max_workers": self.max_workers,
+            }
+
+    # Перехід на нову версію графа: нові завдання обчислюються в новому пулі процесів з graph,
+    # а вже запущені обчислення завершуються у старому
+    def replace_graph(self, graph):
+        with self._changed:
+            self.graph = graph
+            self.graph_version += 1
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self):
+        self._finisher.shutdown(wait=False, cancel_futures=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from graph_core import build_csr_graph, apply_edge_delta, edge_weight_changes, WEIGHT_SCHEMES
+from local_optimization import ARRAY_ENGINES, REVERSE_ENGINES, DEFAULT_ENGINE
+import path_cache
+from path_cache import ShortestPathCache
+
+
+# Невеликий граф асоціацій: дуги з R / N, вага CSV - N / R
+def small_graph():
+    edges = [(1, 2, 10, 100), (2, 3, 20, 100), (1, 3, 5, 100), (3, 4, 50, 100), (2, 4, 4, 100), (4, 1, 25, 100)]
+    frame = pd.DataFrame(edges, columns=['Source', 'Target', 'R', 'N'])
+    frame['Weight'] = frame['N'] / frame['R']
+    frame['SourceWord'] = frame['Source'].astype(str)
+    frame['TargetWord'] = frame['Target'].astype(str)
+    return build_csr_graph(frame, nodes_file=None)
+
+
+def edge_weight(graph, source, target):
+    i, j = graph.index_of[source], graph.index_of[target]
+    start, end = graph.indptr[i], graph.indptr[i + 1]
+    return float(graph.weight[start:end][graph.indices[start:end] == j][0])
+
+
+def test_upsert_recomputes_scheme_weight():
+    graph = small_graph().with_weight('log')
+    upserts = pd.DataFrame({'Source': [1, 3], 'Target': [4, 2], 'R': [40, 30], 'N': [200, 60]})
+    updated, changes = apply_edge_delta(graph, upserts, deletions=[(2, 4)])
+
+    assert updated.scheme == 'log'
+    assert edge_weight(updated, 1, 4) == pytest.approx(-np.log(0.2))
+    assert edge_weight(updated.with_weight('ratio'), 1, 4) == pytest.approx(5.0)
+    new_edges = changes.set_index(['Source', 'Target'])
+    assert new_edges.loc[(1, 4), 'NewWeight'] == pytest.approx(-np.log(0.2))
+    assert new_edges.loc[(2, 4), 'NewWeight'] == np.inf
+
+
+@pytest.mark.parametrize('scheme', list(WEIGHT_SCHEMES))
+@pytest.mark.parametrize('reverse', [False, True])
+def test_cache_repair_matches_recompute(scheme, reverse):
+    base = small_graph()
+    cache = ShortestPathCache(base.with_weight(scheme), reverse=reverse)
+    for node in base.nodes():
+        cache.get(node)
+
+    upserts = pd.DataFrame({'Source': [1, 3, 4], 'Target': [4, 2, 5], 'R': [40, 1, 10], 'N': [200, 100, 20]})
+    updated, _ = apply_edge_delta(base, upserts, deletions=[(1, 3)])
+    cache.apply_delta(updated, edge_weight_changes(base.with_weight(scheme), updated.with_weight(scheme)))
+
+    graph = updated.with_weight(scheme)
+    assert cache.graph is graph
+    misses = cache.misses
+    for node in base.nodes():
+        tree = cache.get(node)
+        engine = (REVERSE_ENGINES if reverse else ARRAY_ENGINES)[DEFAULT_ENGINE]
+        expected, _ = engine(graph, graph.index_of[node])
+        np.testing.assert_allclose(tree.dist, expected)
+    # Дерева відновлено repair_shortest_paths, а не обчислено заново
+    assert cache.misses == misses
+
+
+def test_cache_drops_deleted_start_node():
+    base = small_graph()
+    cache = ShortestPathCache(base)
+    for node in base.nodes():
+        cache.get(node)
+
+    # Без дуг вершина 1 зникає з графа, і індекси решти вершин зсуваються
+    updated, changes = apply_edge_delta(base, deletions=[(1, 2), (1, 3), (4, 1)])
+    cache.apply_delta(updated, changes)
+
+    assert 1 not in cache and 1 not in updated
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] == sum(cache.get(node).dist.nbytes + cache.get(node).pred.nbytes for node in updated.nodes())
+    for node in updated.nodes():
+        expected, _ = ARRAY_ENGINES[DEFAULT_ENGINE](updated, updated.index_of[node])
+        np.testing.assert_allclose(cache.get(node).dist, expected)
+
+
+def test_cache_get_during_delta_matches_its_graph(monkeypatch):
+    base = small_graph()
+    cache = ShortestPathCache(base)
+    for node in base.nodes():
+        cache.get(node)
+    updated, changes = apply_edge_delta(base, deletions=[(1, 3)])
+
+    # Повільне відновлення: поки воно триває, get() має віддавати дерева, узгоджені зі своїм графом
+    repair = path_cache.repair_shortest_paths
+
+    def slow_repair(*args):
+        time.sleep(0.02)
+        return repair(*args)
+
+    monkeypatch.setattr(path_cache, 'repair_shortest_paths', slow_repair)
+    worker = threading.Thread(target=cache.apply_delta, args=(updated, changes))
+    worker.start()
+    seen = set()
+    while worker.is_alive() or not seen:
+        for node in base.nodes():
+            tree = cache.get(node)
+            seen.add(tree.graph is updated)
+            expected, _ = ARRAY_ENGINES[DEFAULT_ENGINE](tree.graph, tree.graph.index_of[node])
+            np.testing.assert_allclose(tree.dist, expected)
+    worker.join()
+    assert cache.graph is updated and False in seen
@@ -0,0 +1,19 @@
+import numpy as np
+
+from graph_core import WEIGHT_SCHEMES
+from graph_snapshot import save_snapshot, load_snapshot
+from test_edge_delta import small_graph
+
+
+def test_snapshot_maps_scheme_weights(tmp_path):
+    graph = small_graph()
+    fingerprint = {"version": 0, "edges": "test"}
+    save_snapshot(graph, graph.subgraph([1, 2]), fingerprint, str(tmp_path / 'graph'))
+    loaded, subgraph = load_snapshot(fingerprint, str(tmp_path / 'graph'))
+
+    assert subgraph.nodes() == [1, 2]
+    for scheme in WEIGHT_SCHEMES:
+        weight = loaded.with_weight(scheme).weight
+        np.testing.assert_allclose(weight, graph.with_weight(scheme).weight)
+        # Масив ваг відкрито зі знімка через mmap, а не обчислено в пам'яті процесу
+        assert isinstance(weight.base, np.memmap)
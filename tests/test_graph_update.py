@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pytest
+
+from local_optimization import ARRAY_ENGINES, REVERSE_ENGINES, DEFAULT_ENGINE
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Слова без прямої дуги між ними (ID 0 та 3362)
+WORD1, WORD2 = 'багатий', 'сорока'
+SOURCE, TARGET = 0, 3362
+
+
+# Застосунок читає CSV та знімки за відносними шляхами, тому імпортується з кореня репозиторію
+@pytest.fixture(scope='module')
+def web_app():
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    import web_app
+    web_app.graph_updates_enabled = True
+    yield web_app
+    web_app.jobs.shutdown()
+    os.chdir(cwd)
+
+
+def optimized_path(client, weight):
+    response = client.post('/optimize_graph', data={'word1': WORD1, 'word2': WORD2, 'weight': weight})
+    return response.get_json()['path'].split(' -> ')
+
+
+def test_graph_update_repairs_caches(web_app):
+    client = web_app.app.test_client()
+    for scheme in ('ratio', 'log'):
+        web_app.path_caches[scheme].get(SOURCE)
+        web_app.reverse_path_caches[scheme].get(TARGET)
+    web_app.subgraph_cache.get(size=10)
+    before = {scheme: optimized_path(client, scheme) for scheme in ('ratio', 'log')}
+    assert all(len(path) > 2 for path in before.values())
+
+    response = client.post('/graph_update', json={'upserts': [{'Source': SOURCE, 'Target': TARGET, 'R': 40, 'N': 200}]})
+    assert response.status_code == 200
+    assert response.get_json()['changed_edges'] == 1
+
+    # Дані, обчислені для CSV-джерел, більше не використовуються
+    assert web_app.distance_matrix is None
+    assert web_app.landmarks_for('ratio') is None
+    assert web_app.subgraph_cache.stats()['entries'] == 0
+
+    path = optimized_path(client, 'log')
+    assert len(path) == 2
+    assert path[1] == f'{TARGET} (Value: {round(-np.log(0.2), 2)})'
+    assert optimized_path(client, 'ratio')[1] == f'{TARGET} (Value: 5.0)'
+
+    # Кешовані дерева кожної схеми відновлені для нового графа і збігаються з повним перерахунком
+    for scheme in ('ratio', 'log'):
+        graph = web_app.weighted_graphs[scheme]
+        for cache, start, engines in ((web_app.path_caches[scheme], SOURCE, ARRAY_ENGINES),
+                                      (web_app.reverse_path_caches[scheme], TARGET, REVERSE_ENGINES)):
+            assert cache.graph is graph and start in cache
+            expected, _ = engines[DEFAULT_ENGINE](graph, graph.index_of[start])
+            np.testing.assert_allclose(cache.get(start).dist, expected)
+
+    response = client.post('/graph_update', json={'deletions': [[SOURCE, TARGET]]})
+    assert response.status_code == 200
+    assert {scheme: optimized_path(client, scheme) for scheme in ('ratio', 'log')} == before
+
+
+def test_graph_update_validation(web_app):
+    client = web_app.app.test_client()
+    assert client.post('/graph_update', json={}).status_code == 400
+    assert client.post('/graph_update', json={'upserts': [{'Source': SOURCE, 'Target': TARGET}]}).status_code == 400
+    response = client.post('/graph_update', json={'upserts': [{'Source': SOURCE, 'Target': TARGET, 'R': 0, 'N': 5}]})
+    assert response.status_code == 400
+
+    web_app.graph_updates_enabled = False
+    try:
+        response = client.post('/graph_update', json={'deletions': [[SOURCE, TARGET]]})
+        assert response.status_code == 403
+    finally:
+        web_app.graph_updates_enabled = True
@@ -1,20 +1,52 @@
+import cProfile
 import json
+import math
 import os
-import csv
-import zipfile
-from io import BytesIO
-from flask import Flask, render_template, jsonify, request, send_from_directory, send_file
+import threading
+import time
+from itertools import chain
+from flask import Flask, render_template, jsonify, request, send_from_directory, session, Response, g, url_for
 from word_checker import get_id_by_name, get_name_by_id
-from local_optimization import local_optimize_graph, read_graph_from_csv, initialize_graph, reconstruct_path, load_into_csv
-from json_subgraph_add_values import update_values_and_labels, update_is_in_path
-from create_subgraph import create_subgraph_based_on_degree
+from local_optimization import reconstruct_path, mapping_rows, nearest_sources, k_shortest_paths, \
+    optimizer_counters, shortest_path as find_shortest_path
+from json_subgraph_add_values import build_subgraph_payload, subgraph_template
+from create_subgraph import SubgraphCache, SUBGRAPH_METHODS, EGO_DIRECTIONS
+from graph_snapshot import load_graph, source_fingerprint
+from distance_matrix import load_distance_matrix
+from landmarks import landmark_index
+from graph_core import WEIGHT_SCHEMES, DEFAULT_WEIGHT, apply_edge_delta, edge_weight_changes
 import pandas as pd
 from opt_path_to_json import opt_path_to_json
+from path_cache import ShortestPathCache, AllPairsStore, DEFAULT_MAX_BYTES
+from mapping_export import stream_mapping, MAPPING_FORMATS
+from batch_paths import batch_shortest_paths
+from metrics import registry as metrics, stage
+from query_jobs import JobQueue, DEFAULT_MAX_PENDING
 
 app = Flask(__name__)
+# Ключ підпису сесій; для кількох процесів-обробників має бути спільним (задається через SECRET_KEY)
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
 
-global optimized_graph, all_paths, first_word_id
 full_nodes_count = 3892
+# JSON-файли шляху та підграфа лише експортуються за бажанням; відповіді будуються в пам'яті
+export_json_files = os.environ.get('EXPORT_JSON_FILES', '') == '1'
+optimized_path_json = 'jsons/optimized_path.json'
+# Найбільша кількість пар в одному запиті /batch_paths
+max_batch_pairs = int(os.environ.get('MAX_BATCH_PAIRS', 10000))
+# Найбільша кількість альтернативних шляхів (параметр k у /optimize_graph)
+max_k_paths = int(os.environ.get('MAX_K_PATHS', 10))
+# Профілювання окремих запитів (заголовок X-Profile: 1) дозволяється лише явно
+profiling_enabled = os.environ.get('ENABLE_PROFILING', '') == '1'
+profiles_dir = 'profiles'
+# Фонові завдання оптимізації (/optimize_graph з async=1): кількість процесів і найбільша черга
+async_workers = int(os.environ.get('ASYNC_WORKERS', 0)) or None
+max_pending_jobs = int(os.environ.get('MAX_PENDING_JOBS', DEFAULT_MAX_PENDING))
+# Підграфи демонстрації (/demo): найбільша кількість вершин і радіус околу, кількість підграфів у кеші
+max_subgraph_nodes = int(os.environ.get('MAX_SUBGRAPH_NODES', 500))
+max_ego_hops = int(os.environ.get('MAX_EGO_HOPS', 3))
+max_cached_subgraphs = int(os.environ.get('MAX_CACHED_SUBGRAPHS', 32))
+# Зміни дуг під час роботи сервера (/graph_update) дозволяються лише явно
+graph_updates_enabled = os.environ.get('ENABLE_GRAPH_UPDATES', '') == '1'
 
 # Load the JSON file safely and initialize graphs on startup
 try:
@@ -23,22 +55,82 @@ try:
     # Load and initialize the full graph from CSV files at startup
     full_edges_path = 'csvs/cue1_response2_str_filtered_ROOT.csv'
     full_nodes_path = 'csvs/nodes12_list.csv'
-    df_full = read_graph_from_csv(full_edges_path)
-    full_graph = initialize_graph(df_full)
+    # Ключ CSV-джерел обчислюється один раз і спільний для знімка, матриці відстаней та орієнтирів
+    source_key = source_fingerprint(full_edges_path, full_nodes_path, 25)
+    # Скомпільований граф і підграф відкриваються зі знімка; CSV розбираються лише, якщо він застарів.
+    # Масиви графа відкриваються через mmap, тож кілька процесів-обробників (наприклад,
+    # gunicorn -w 4 web_app:app) ділять одні сторінки пам'яті; приватними є лише масиви міток пошуку
+    full_graph, subgraph = load_graph(full_edges_path, full_nodes_path, subgraph_size=25, fingerprint=source_key)
+    # Ваги інших схем відкриваються зі знімка через mmap (weight_<схема>.npy), тож графи схем не створюють
+    # приватних масивів у процесах-обробниках; граф кожної схеми ділить решту масивів
+    weighted_graphs = {scheme: full_graph.with_weight(scheme) for scheme in WEIGHT_SCHEMES}
+    # Кеші результатів оптимізації за першим словом (ліміт пам'яті в байтах), окремі для кожної схеми ваг
+    path_caches = {scheme: ShortestPathCache(graph, max_bytes=int(os.environ.get('PATH_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+                   for scheme, graph in weighted_graphs.items()}
+    path_cache = path_caches[DEFAULT_WEIGHT]
+    # Окремі кеші зворотного режиму: мітки від усіх слів до заданого (розмітка "відстань до X")
+    reverse_path_caches = {scheme: ShortestPathCache(graph, reverse=True,
+                                                     max_bytes=int(os.environ.get('PATH_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+                           for scheme, graph in weighted_graphs.items()}
 
     subgraph_with_path = 'jsons/subgraph_with_values.json'
     subgraph_no_path = 'jsons/subgraph_no_values.json'
     subgraph_nodes_path = 'csvs/subgraph_1_2_nodes.csv'
     subgraph_edges_path = 'csvs/subgraph_1_2_edges.csv'
-    subgraph = create_subgraph_based_on_degree(full_graph, 25)
-    # Load SVG file content
-    with open('static/svg/full_graph.svg', 'r', encoding='utf-8') as file:
-        svg_content = file.read()
+    # Усі 625 пар демонстраційного підграфа обчислюються один раз під час запуску
+    subgraph_paths = AllPairsStore(subgraph)
+    # Підграфи за параметрами (/subgraph_data); дерева шляхів у них обчислюються лише на вимогу
+    subgraph_cache = SubgraphCache(full_graph, make=lambda graph: (ShortestPathCache(graph), subgraph_template(graph)),
+                                   max_entries=max_cached_subgraphs)
+    # Попередньо обчислена матриця всіх пар (python distance_matrix.py); без неї шляхи шукаються під час запиту
+    distance_matrix = load_distance_matrix(full_graph, source_key)
+    # Орієнтири для пошуку A* між двома словами (python landmarks.py), окремі для кожної схеми ваг:
+    # для схеми за замовчуванням - під час запуску, для решти - під час першого запиту (landmarks_for)
+    landmark_indexes = {DEFAULT_WEIGHT: landmark_index(weighted_graphs[DEFAULT_WEIGHT], source_key)}
+    landmarks_lock = threading.Lock()
+    # Зміни графа (apply_graph_update) застосовуються по одній
+    graph_update_lock = threading.Lock()
+    # Дерева, обчислені фоновими завданнями, потрапляють у кеш своєї схеми ваг
+    jobs = JobQueue(full_graph, store=lambda scheme, tree: path_caches[scheme].put(tree.start_node, tree.dist, tree.pred, tree.graph),
+                    max_workers=async_workers, max_pending=max_pending_jobs)
     app.logger.info("Graph and JSON data loaded successfully.")
 except Exception as e:
     app.logger.error(f"Failed to initialize graph or load graph data: {e}")
     graph_data = {}  # Default to an empty graph if loading fails
 
+# Load SVG file content
+try:
+    with open('static/svg/full_graph.svg', 'r', encoding='utf-8') as file:
+        svg_content = file.read()
+except Exception as e:
+    app.logger.error(f"Failed to load SVG file: {e}")
+    svg_content = ''
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiling_enabled and request.headers.get('X-Profile') == '1':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def record_request_metrics(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        # Дамп cProfile запиту; переглядається, наприклад, python -m pstats <файл>
+        os.makedirs(profiles_dir, exist_ok=True)
+        profile_path = os.path.join(profiles_dir, f"{request.endpoint or 'unknown'}-{time.time_ns()}.prof")
+        profiler.dump_stats(profile_path)
+        response.headers['X-Profile-File'] = profile_path
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe_request(request.endpoint or 'unknown', request.method, response.status_code,
+                                time.perf_counter() - started)
+    return response
+
 
 @app.route('/')
 def home():
@@ -52,7 +144,66 @@ def graph_data_route():
 
 @app.route('/demo')
 def demo():
-    return render_template('demo.html', active_page='demo')
+    return render_template('demo.html', active_page='demo', max_subgraph_nodes=max_subgraph_nodes,
+                           max_ego_hops=max_ego_hops)
+
+
+# Числовий параметр запиту; ValueError з повідомленням для користувача, якщо його не вдалося розібрати
+def numeric_param(values, name, cast, default, message):
+    try:
+        return cast(values.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(message)
+
+
+# Параметри підграфа демонстрації із запиту; None - фіксований підграф (jsons/subgraph_no_values.json)
+def requested_subgraph_params(values):
+    method = values.get('method')
+    if not method or method == 'fixed':
+        return None
+    if method not in SUBGRAPH_METHODS:
+        raise ValueError(f"Невідомий метод побудови підграфа: {method}. Доступні: {', '.join(SUBGRAPH_METHODS)}")
+    size = numeric_param(values, 'size', int, 25, "Розмір підграфа має бути цілим числом.")
+    if not 1 <= size <= max_subgraph_nodes:
+        raise ValueError(f"Розмір підграфа має бути від 1 до {max_subgraph_nodes}.")
+    params = {"method": method, "size": size}
+    if method == 'ego':
+        center = get_id_by_name(full_nodes_path, values.get('center', ''))
+        if center is None:
+            raise ValueError("Центральне слово не наявне в мережі.")
+        hops = numeric_param(values, 'hops', int, 1, "Радіус околу має бути цілим числом.")
+        if not 1 <= hops <= max_ego_hops:
+            raise ValueError(f"Радіус околу має бути від 1 до {max_ego_hops}.")
+        direction = values.get('direction', 'both')
+        if direction not in EGO_DIRECTIONS:
+            raise ValueError(f"Невідомий напрямок: {direction}. Доступні: {', '.join(EGO_DIRECTIONS)}")
+        params.update(center=int(center), hops=hops, direction=direction)
+    elif method == 'threshold':
+        params["max_weight"] = numeric_param(values, 'max_weight', float, None, "Поріг ваги має бути числом.")
+    return params
+
+
+# Підграф демонстрації: граф, дерево найкоротших шляхів від вершини (функція) та JSON без міток
+def demo_subgraph(params):
+    if params is None:
+        return subgraph, subgraph_paths.tree, graph_data
+    graph, (paths, template) = subgraph_cache.get(**params)
+    return graph, paths.get, template
+
+
+@app.route('/subgraph_data')
+def subgraph_data():
+    # Підграф за параметрами: method=degree|ego|threshold, size, center, hops, direction, max_weight
+    try:
+        params = requested_subgraph_params(request.args)
+        graph, _, template = demo_subgraph(params)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    words = [{"Name": name, "Label": label if label is not None else name}
+             for name, label in zip(graph.names.tolist(), graph.labels.tolist()) if name is not None]
+    return jsonify({"status": "success", "message": f"Підграф: {graph.number_of_nodes()} вершин, "
+                                                    f"{graph.number_of_edges()} дуг.",
+                    "graph": template, "words": words})
 
 
 @app.route('/words_full')
@@ -82,20 +233,29 @@ def optimize_subgraph():
     word1 = request.form.get('word1', '')
     word2 = request.form.get('word2', '')
     try:
-        word1_id = get_id_by_name(subgraph_nodes_path, word1)
-        word2_id = get_id_by_name(subgraph_nodes_path, word2)
-
-        optimized_subgraph, all_paths = local_optimize_graph(subgraph, word1_id)
-        sub_path = reconstruct_path(subgraph, all_paths, word1_id, word2_id)
-
-        update_values_and_labels(subgraph_no_path, subgraph_with_path, optimized_subgraph)
-        update_is_in_path(subgraph_with_path, subgraph_with_path, sub_path)
+        params = requested_subgraph_params(request.form)
+        sub, subgraph_tree, template = demo_subgraph(params)
+        nodes_path = subgraph_nodes_path if params is None else full_nodes_path
+        word1_id = get_id_by_name(nodes_path, word1)
+        word2_id = get_id_by_name(nodes_path, word2)
+        if word1_id not in sub or word2_id not in sub:
+            return jsonify({"status": "error", "message": "Одне чи обидва слова не наявні в підграфі."})
+
+        tree = subgraph_tree(word1_id)
+        sub_path = reconstruct_path(sub, tree, word1_id, word2_id)
+        # Пара й параметри підграфа зберігаються в сесії, щоб /graph_data_with_path відтворив той самий підграф
+        session['subgraph_pair'] = [int(word1_id), int(word2_id)]
+        session['subgraph_params'] = params
+        graph = build_subgraph_payload(template, sub, tree, sub_path)
+        if export_json_files:
+            with open(subgraph_with_path, 'w', encoding='utf-8') as file:
+                json.dump(graph, file, indent=4, ensure_ascii=False)
 
         if sub_path is None or len(sub_path) == 1:
             message = f"Не існує шляху між {word1} та {word2}, або введені слова є однаковими."
-            return jsonify({"status": "warning", "message": message})
+            return jsonify({"status": "warning", "message": message, "graph": graph})
 
-        return jsonify({"status": "success", "message": "Проведена оптимізація підграфу."})
+        return jsonify({"status": "success", "message": "Проведена оптимізація підграфу.", "graph": graph})
     except Exception as e:
         error_message = str(e)
         app.logger.error("Помилка при оптимізації підграфу: " + error_message)
@@ -105,18 +265,124 @@ def optimize_subgraph():
 @app.route('/graph_data_with_path')
 def graph_data_with_path():
     try:
-        with open(subgraph_with_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        return jsonify(data)
+        pair = session.get('subgraph_pair')
+        if pair is None:
+            return jsonify(graph_data)
+        word1_id, word2_id = pair
+        sub, subgraph_tree, template = demo_subgraph(session.get('subgraph_params'))
+        all_paths = subgraph_tree(word1_id)
+        sub_path = reconstruct_path(sub, all_paths, word1_id, word2_id)
+        return jsonify(build_subgraph_payload(template, sub, all_paths, sub_path))
     except Exception as e:
-        app.logger.error(f"Failed to load or parse 'subgraph_with_values.json': {e}")
+        app.logger.error(f"Failed to build subgraph data with path: {e}")
         return jsonify({"error": "Failed to load resource"}), 500
 
 
+# Схема ваг запиту (параметр weight), інакше - схема останньої оптимізації в сесії (remembered=True)
+# або схема за замовчуванням
+def requested_weight(remembered=True):
+    scheme = request.values.get('weight') or (session.get('weight', DEFAULT_WEIGHT) if remembered else DEFAULT_WEIGHT)
+    if scheme not in WEIGHT_SCHEMES:
+        raise ValueError(f"Невідома схема ваг: {scheme}. Доступні: {', '.join(WEIGHT_SCHEMES)}")
+    return scheme
+
+
+# Індекс орієнтирів схеми ваг; відкривається або будується під час першого звернення
+def landmarks_for(weight):
+    index = landmark_indexes.get(weight)
+    if index is None:
+        with landmarks_lock:
+            index = landmark_indexes.get(weight)
+            # Після apply_graph_update граф більше не відповідає CSV-джерелам, і орієнтирів для нього немає
+            if index is None and source_key is not None:
+                with stage('landmarks'):
+                    index = landmark_index(weighted_graphs[weight], source_key, weight=weight)
+                landmark_indexes[weight] = index
+    return index
+
+
+# Шлях між двома словами: з кешованого дерева, якщо воно є, інакше пошуком між двома вершинами
+def path_between(source_id, target_id, weight=DEFAULT_WEIGHT):
+    cache = path_caches[weight]
+    matrix = distance_matrix
+    if weight == DEFAULT_WEIGHT and matrix is not None:
+        with stage('distance_matrix'):
+            return matrix.path(source_id, target_id)
+    with stage('shortest_path'):
+        # Дерево несе граф, для якого його обчислено, тож шлях не залежить від оновлень графа між зверненнями
+        tree = cache.get(source_id) if source_id in cache else None
+        if tree is not None:
+            return reconstruct_path(tree.graph, tree, source_id, target_id)
+        graph = weighted_graphs[weight]
+        landmarks = landmarks_for(weight)
+        # Орієнтири попередньої версії графа (до apply_graph_update) не дають правильних оцінок
+        if landmarks is not None and landmarks.graph is not graph:
+            landmarks = None
+        return find_shortest_path(graph, source_id, target_id, landmarks=landmarks)
+
+
+def apply_graph_update(upserts=None, deletions=None):
+    """
+    Застосовує зміни дуг (apply_edge_delta) до графа працюючого застосунку.
+
+    Спершу вимикаються матриця відстаней і орієнтири, обчислені для CSV-джерел, далі одним присвоєнням
+    замінюються граф і графи схем ваг. Кеші дерев кожної схеми (прямі та зворотні) відновлюються
+    repair_shortest_paths зі змінами ваг саме цієї схеми, кеш підграфів скидається, а нові фонові
+    завдання обчислюються в пулі процесів з новим графом.
+
+    Args:
+        upserts (pd.DataFrame): Нові або змінені дуги (Source, Target, R, N; інші колонки - як у apply_edge_delta).
+        deletions (list): Пари ID (Source, Target) дуг, що видаляються.
+
+    Returns:
+        pd.DataFrame: Зміни ваг схеми за замовчуванням (Source, Target, OldWeight, NewWeight).
+    """
+    global full_graph, weighted_graphs, distance_matrix, source_key
+    with graph_update_lock:
+        with stage('apply_edge_delta'):
+            updated, changes = apply_edge_delta(full_graph, upserts, deletions)
+            graphs = {scheme: updated.with_weight(scheme) for scheme in WEIGHT_SCHEMES}
+        distance_matrix = None
+        with landmarks_lock:
+            source_key = None
+            landmark_indexes.clear()
+        previous, (full_graph, weighted_graphs) = weighted_graphs, (updated, graphs)
+        jobs.replace_graph(updated)
+        subgraph_cache.replace_graph(updated)
+        with stage('repair_path_caches'):
+            for scheme, graph in graphs.items():
+                scheme_changes = changes if scheme == DEFAULT_WEIGHT else edge_weight_changes(previous[scheme], graph)
+                path_caches[scheme].apply_delta(graph, scheme_changes)
+                reverse_path_caches[scheme].apply_delta(graph, scheme_changes)
+    return changes
+
+
+# Дані шляху для візуалізації; файл jsons/optimized_path.json записується лише як експорт
+def path_payload(path, weight=DEFAULT_WEIGHT, export=True):
+    json_file_path = optimized_path_json if export and export_json_files else None
+    with stage('opt_path_to_json'):
+        return opt_path_to_json(path, json_file_path=json_file_path, graph=weighted_graphs[weight])
+
+
+# Відповідь /optimize_graph для знайденого шляху та альтернативних шляхів (paths, якщо k > 1)
+def optimization_response(path, paths, weight):
+    if path is None or not path:
+        return {"status": "warning", "message": "Немає шляху між введеними словами."}
+
+    path_display = " -> ".join(str(node) for node in path)
+    graph = path_payload(path, weight)
+    response = {"status": "success", "message": "Проведена оптимізація графу.", "path": path_display,
+                "graph": graph}
+    if paths is not None:
+        # Експортний JSON-файл лишається для найкоротшого шляху; альтернативи лише у відповіді
+        response["paths"] = [{"path": " -> ".join(alternative),
+                              "graph": graph if index == 0 else path_payload(alternative, weight, export=False)}
+                             for index, alternative in enumerate(paths)]
+    return response
+
+
 @app.route('/optimize_graph', methods=['POST'])
 def optimize_graph():
-    global optimized_graph, all_paths, first_word_id
-
     word1 = request.form['word1']
     word2 = request.form['word2']
 
@@ -125,55 +391,305 @@ def optimize_graph():
         return jsonify({"status": "error", "message": "Введені слова ідентичні."})
 
     try:
-        word1_id = get_id_by_name(full_nodes_path, word1)
-        word2_id = get_id_by_name(full_nodes_path, word2)
+        with stage('get_id_by_name'):
+            word1_id = get_id_by_name(full_nodes_path, word1)
+            word2_id = get_id_by_name(full_nodes_path, word2)
 
         if word1_id is None or word2_id is None:
             return jsonify({"status": "error", "message": "Одне чи обидва слова не наявні в мережі."})
 
-        optimized_graph, all_paths = local_optimize_graph(full_graph, word1_id)
-        path = reconstruct_path(full_graph, all_paths, word1_id, word2_id)
-        first_word_id = word1_id
-        load_into_csv(optimized_graph, 'for_site/mapping.csv')
-
-        if path is None or not path:
-            return jsonify({"status": "warning", "message": "Немає шляху між введеними словами."})
-
-        path_display = " -> ".join(str(node) for node in path)
-        opt_path_to_json(path)
-        return jsonify({"status": "success", "message": "Проведена оптимізація графу.", "path": path_display})
+        try:
+            k = int(request.form.get('k', 1))
+        except ValueError:
+            return jsonify({"status": "error", "message": "Параметр k має бути цілим числом."})
+        if not 1 <= k <= max_k_paths:
+            return jsonify({"status": "error", "message": f"Параметр k має бути від 1 до {max_k_paths}."})
+        # Нова оптимізація не успадковує схему ваг попередньої
+        try:
+            weight = requested_weight(remembered=False)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)})
+        cache = path_caches[weight]
+
+        # У сесії зберігаються лише перше слово та схема ваг; результат береться з кешу цієї схеми
+        session['first_word_id'] = int(word1_id)
+        session['weight'] = weight
+
+        # Мітки всіх вершин потрібні лише для файлу відображення; інакше достатньо пошуку між двома словами
+        with_mapping = request.form.get('mapping', '').lower() in ('1', 'true', 'yes')
+        session['path_pair'] = [int(word1_id), int(word2_id)]
+
+        # Режим завдання: у пул процесів іде лише обчислення повного дерева від першого слова (розмітка
+        # або альтернативні шляхи), якого ще немає в кеші; решта запитів відповідає одразу, як і без async
+        run_async = request.form.get('async', '').lower() in ('1', 'true', 'yes')
+        if run_async and (with_mapping or k > 1) and word1_id not in cache:
+            def finish(tree):
+                if k > 1:
+                    with stage('k_shortest_paths'):
+                        paths = k_shortest_paths(tree.graph, word1_id, word2_id, k, all_paths=tree)
+                    return optimization_response(paths[0] if paths else None, paths, weight)
+                return optimization_response(path_between(word1_id, word2_id, weight), None, weight)
+
+            try:
+                job_id = jobs.submit(word1_id, weight, finish)
+            except RuntimeError as e:
+                return jsonify({"status": "error", "message": str(e)}), 503
+            return jsonify({"status": "accepted", "message": "Оптимізацію графу поставлено в чергу.",
+                            "job_id": job_id, "status_url": url_for('job_status', job_id=job_id),
+                            "events_url": url_for('job_events', job_id=job_id)}), 202
+
+        if with_mapping:
+            # Спільний граф не змінюється: мітки й попередники зберігаються в окремих масивах кешу;
+            # сама розмітка формується лише під час завантаження (/download_mapping_zip)
+            with stage('local_optimize_graph'):
+                cache.get(word1_id)
+        if k > 1:
+            # Альтернативні шляхи; перший пошук використовує кешоване дерево першого слова, якщо воно є
+            tree = cache.get(word1_id) if word1_id in cache else None
+            graph = tree.graph if tree is not None else weighted_graphs[weight]
+            with stage('k_shortest_paths'):
+                paths = k_shortest_paths(graph, word1_id, word2_id, k, all_paths=tree)
+            path = paths[0] if paths else None
+        else:
+            paths = None
+            path = path_between(word1_id, word2_id, weight)
+        return jsonify(optimization_response(path, paths, weight))
     except Exception as e:
         error_message = str(e)
         app.logger.error("Помилка при оптимізації графу: " + error_message)
         return jsonify({"status": "error", "message": "Помилка при оптимізації графу: " + error_message})
 
 
+@app.route('/optimize_nearest', methods=['POST'])
+def optimize_nearest():
+    # Яке з кількох слів найближче до цільового: один пошук від усіх слів одночасно
+    payload = request.get_json(silent=True) or {}
+    words = payload.get('sources')
+    target = payload.get('target')
+    offsets = payload.get('offsets')
+    if not isinstance(words, list) or not words or not isinstance(target, str):
+        return jsonify({"status": "error",
+                        "message": "Очікується JSON виду {\"sources\": [\"слово1\", ...], \"target\": \"слово\"}."}), 400
+    if offsets is not None and (not isinstance(offsets, list) or len(offsets) != len(words)):
+        return jsonify({"status": "error", "message": "Кількість зміщень має дорівнювати кількості слів."}), 400
+    if offsets is not None and not all(isinstance(offset, (int, float)) and not isinstance(offset, bool)
+                                       and math.isfinite(offset) for offset in offsets):
+        return jsonify({"status": "error", "message": "Зміщення мають бути скінченними числами."}), 400
+
+    try:
+        source_ids = [get_id_by_name(full_nodes_path, str(word)) for word in words]
+        target_id = get_id_by_name(full_nodes_path, target)
+        unknown = [str(word) for word, word_id in zip(words, source_ids) if word_id is None]
+        if unknown or target_id is None:
+            return jsonify({"status": "error", "message": "Слова не наявні в мережі: " +
+                            ", ".join(unknown + ([target] if target_id is None else []))})
+
+        weight = payload.get('weight', DEFAULT_WEIGHT)
+        tree = nearest_sources(full_graph.with_weight(weight), source_ids, offsets)
+        nearest_id = tree.source_of(target_id)
+        if nearest_id is None:
+            return jsonify({"status": "warning", "message": "Немає шляху від жодного слова до цільового."})
+
+        path = reconstruct_path(tree.graph, tree, nearest_id, target_id)
+        value = tree.value(target_id)
+        return jsonify({"status": "success", "message": "Знайдено найближче слово.",
+                        "nearest": words[source_ids.index(nearest_id)], "value": round(value, 2),
+                        "path": " -> ".join(path), "graph": path_payload(path, weight)})
+    except (ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        error_message = str(e)
+        app.logger.error("Помилка при пошуку найближчого слова: " + error_message)
+        return jsonify({"status": "error", "message": "Помилка при пошуку найближчого слова: " + error_message})
+
+
 @app.route('/optimize_new_second_word', methods=['POST'])
 def optimize_new_second_word():
-    global optimized_graph, all_paths, first_word_id
-
     new_second_word = request.form['newSecondWord']
 
     try:
+        first_word_id = session.get('first_word_id')
+        if first_word_id is None:
+            # Сесії немає (наприклад, інший обробник без спільного ключа) - перше слово передає клієнт
+            first_word_id = get_id_by_name(full_nodes_path, request.form.get('startNode', ''))
+        if first_word_id is None:
+            return jsonify({"status": "error", "message": "Спочатку проведіть оптимізацію графу."})
+
         new_second_word_id = get_id_by_name(full_nodes_path, new_second_word)
 
         if new_second_word_id is None:
             return jsonify({"status": "error", "message": "Слово не наявне в мережі."})
 
-        path = reconstruct_path(optimized_graph, all_paths, first_word_id, new_second_word_id)
+        weight = requested_weight()
+        if weight == DEFAULT_WEIGHT and distance_matrix is not None:
+            # Шлях читається з матриці всіх пар за O(довжини шляху)
+            path = path_between(first_word_id, new_second_word_id, weight)
+        else:
+            with stage('local_optimize_graph'):
+                all_paths = path_caches[weight].get(first_word_id)
+            path = reconstruct_path(all_paths.graph, all_paths, first_word_id, new_second_word_id)
+        session['path_pair'] = [int(first_word_id), int(new_second_word_id)]
 
         if path is None or not path:
             return jsonify({"status": "warning", "message": "Немає шляху між введеними словами."})
 
         path_display = " -> ".join(str(node) for node in path)
-        opt_path_to_json(path)
-        return jsonify({"status": "success", "message": "Шлях реконструйовано.", "path": path_display})
+        graph = path_payload(path, weight)
+        return jsonify({"status": "success", "message": "Шлях реконструйовано.", "path": path_display, "graph": graph})
     except Exception as e:
         error_message = str(e)
         app.logger.error("Помилка при реконструкції шляху: " + error_message)
         return jsonify({"status": "error", "message": "Помилка при реконструкції шляху: " + error_message})
 
 
+@app.route('/batch_paths', methods=['POST'])
+def batch_paths():
+    payload = request.get_json(silent=True) or {}
+    pairs = payload.get('pairs')
+    if not isinstance(pairs, list) or not all(isinstance(pair, (list, tuple)) and len(pair) == 2 for pair in pairs):
+        return jsonify({"status": "error", "message": "Очікується JSON виду {\"pairs\": [[\"слово1\", \"слово2\"], ...]}."}), 400
+    if len(pairs) > max_batch_pairs:
+        return jsonify({"status": "error", "message": f"Забагато пар: максимум {max_batch_pairs}."}), 400
+
+    ids = [(get_id_by_name(full_nodes_path, str(word1)), get_id_by_name(full_nodes_path, str(word2)))
+           for word1, word2 in pairs]
+    known = [index for index, (word1_id, word2_id) in enumerate(ids) if word1_id is not None and word2_id is not None]
+
+    # Результат для пари у форматі, близькому до відповіді /optimize_graph
+    def records():
+        for index, (word1_id, word2_id) in enumerate(ids):
+            if word1_id is None or word2_id is None:
+                yield {"index": index, "word1": pairs[index][0], "word2": pairs[index][1], "status": "error",
+                       "message": "Одне чи обидва слова не наявні в мережі."}
+        # Пошуки йдуть у спільному обмеженому пулі процесів фонових завдань, а не в новому пулі для кожного запиту
+        executor, graph = jobs.executor()
+        for result in batch_shortest_paths(graph, [ids[index] for index in known], executor=executor):
+            index = known[result["index"]]
+            yield {"index": index, "word1": pairs[index][0], "word2": pairs[index][1],
+                   "status": "success" if result["value"] is not None else "warning",
+                   "value": result["value"], "path": " -> ".join(result["path"])}
+
+    # Для великих пакетів результати віддаються потоком NDJSON у порядку готовності
+    wants_ndjson = request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+    if wants_ndjson:
+        lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in records())
+        return Response(lines, mimetype='application/x-ndjson')
+
+    results = sorted(records(), key=lambda record: record["index"])
+    return jsonify({"status": "success", "results": results})
+
+
+# Відповідь на опитування стану завдання: поки воно не завершене - status "pending",
+# потім - відповідь /optimize_graph (або помилка) разом з job_id
+def job_response(job):
+    if job["state"] == "done":
+        return dict(job["result"], job_id=job["job_id"], state=job["state"])
+    if job["state"] == "failed":
+        return {"status": "error", "message": "Помилка при оптимізації графу: " + job["error"],
+                "job_id": job["job_id"], "state": job["state"]}
+    return {"status": "pending", "message": "Проводиться оптимізація графу.", "job_id": job["job_id"],
+            "state": job["state"]}
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Завдання не знайдено."}), 404
+    return jsonify(job_response(job))
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    # Server-sent events: подія state при кожній зміні стану, наприкінці - подія result
+    if jobs.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Завдання не знайдено."}), 404
+
+    def events():
+        state = None
+        while True:
+            job = jobs.wait(job_id, state)
+            if job is None:
+                yield 'event: result\ndata: ' + json.dumps({"status": "error", "message": "Завдання не знайдено."},
+                                                           ensure_ascii=False) + '\n\n'
+                return
+            if job["finished"] is not None:
+                yield 'event: result\ndata: ' + json.dumps(job_response(job), ensure_ascii=False) + '\n\n'
+                return
+            if job["state"] != state:
+                state = job["state"]
+                yield 'event: state\ndata: ' + json.dumps(job_response(job), ensure_ascii=False) + '\n\n'
+            else:
+                # Коментар підтримує з'єднання через проксі, поки завдання виконується
+                yield ': keep-alive\n\n'
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/graph_update', methods=['POST'])
+def graph_update():
+    # Нова хвиля опитування: додавання дуг, зміна R / N та видалення дуг без перезапуску сервера
+    if not graph_updates_enabled:
+        return jsonify({"status": "error", "message": "Оновлення графа вимкнено."}), 403
+    payload = request.get_json(silent=True) or {}
+    upserts = payload.get('upserts', [])
+    deletions = payload.get('deletions', [])
+    usage = ("Очікується JSON виду {\"upserts\": [{\"Source\": 1, \"Target\": 2, \"R\": 10, \"N\": 100}, ...], "
+             "\"deletions\": [[1, 2], ...]}.")
+    if not isinstance(upserts, list) or not isinstance(deletions, list) or not (upserts or deletions):
+        return jsonify({"status": "error", "message": usage}), 400
+    try:
+        upserts = pd.DataFrame(upserts, columns=['Source', 'Target', 'R', 'N'] +
+                               [column for column in ('SourceWord', 'TargetWord') if any(column in edge for edge in upserts)])
+        if upserts[['Source', 'Target', 'R', 'N']].isna().any(axis=None):
+            raise ValueError("missing edge fields")
+        upserts = upserts.astype({'Source': 'int64', 'Target': 'int64', 'R': 'int64', 'N': 'int64'})
+        deletions = [(int(source), int(target)) for source, target in deletions]
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": usage}), 400
+    if ((upserts['R'] <= 0) | (upserts['N'] < upserts['R'])).any():
+        return jsonify({"status": "error", "message": "Для кожної дуги має бути 0 < R <= N."}), 400
+
+    try:
+        changes = apply_graph_update(upserts, deletions)
+    except Exception as e:
+        app.logger.error(f"Failed to apply graph update: {e}")
+        return jsonify({"status": "error", "message": "Помилка при оновленні графа: " + str(e)}), 500
+    return jsonify({"status": "success", "message": "Граф оновлено.", "changed_edges": len(changes),
+                    "nodes": full_graph.number_of_nodes(), "edges": full_graph.number_of_edges()})
+
+
+@app.route('/cache_stats')
+def cache_stats():
+    stats = dict(path_cache.stats(), reverse=reverse_path_caches[DEFAULT_WEIGHT].stats())
+    stats["weights"] = {scheme: {"forward": path_caches[scheme].stats(), "reverse": reverse_path_caches[scheme].stats()}
+                        for scheme in WEIGHT_SCHEMES if scheme != DEFAULT_WEIGHT}
+    stats["subgraphs"] = subgraph_cache.stats()
+    return jsonify(stats)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Лічильники рушіїв оптимізації та кешів результатів у форматі Prometheus
+    counters = {}
+    for (engine, name), value in sorted(optimizer_counters.items()):
+        counters.setdefault(f'optimizer_{name}_total', []).append(({"engine": engine}, value))
+    gauges = {}
+    job_stats = jobs.stats()
+    for name in ('submitted', 'deduplicated', 'rejected', 'failed'):
+        counters[f'jobs_{name}_total'] = [({}, job_stats[name])]
+    gauges['jobs'] = [({"state": state}, job_stats[state]) for state in ('queued', 'running', 'done')]
+    for direction, caches in (('forward', path_caches), ('reverse', reverse_path_caches)):
+        for scheme, cache in caches.items():
+            labels = {"weight": scheme, "direction": direction}
+            stats = cache.stats()
+            for name in ('hits', 'misses', 'evictions'):
+                counters.setdefault(f'path_cache_{name}_total', []).append((labels, stats[name]))
+            for name in ('entries', 'bytes'):
+                gauges.setdefault(f'path_cache_{name}', []).append((labels, stats[name]))
+    return Response(metrics.render(counters, gauges), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/optimized_path_intro_data')
 def optimized_path_intro_data():
     try:
@@ -188,18 +704,15 @@ def optimized_path_intro_data():
 @app.route('/optimized_path_data')
 def optimized_path_data():
     try:
-        with open('jsons/optimized_path.json', 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        # Ensure data structure is correct
-        if 'nodes' not in data:
-            data['nodes'] = []
-        if 'edges' not in data:
-            data['edges'] = []
-        app.logger.info(f"Optimized path data loaded successfully: {data}")
-
+        # Шлях останнього запиту цієї сесії відтворюється з кешу, а не зі спільного файлу
+        pair = session.get('path_pair')
+        if pair is None:
+            return jsonify({"nodes": [], "edges": []})
+        weight = session.get('weight', DEFAULT_WEIGHT)
+        data = path_payload(path_between(*pair, weight), weight)
         return jsonify(data)
     except Exception as e:
-        app.logger.error(f"Failed to load 'optimized_path.json': {e}")
+        app.logger.error(f"Failed to build optimized path data: {e}")
         return jsonify({"error": "Failed to load optimized path data"}), 500
 
 
@@ -226,21 +739,34 @@ def download_assoc_data():
 @app.route('/download_mapping_zip', methods=['POST'])
 def download_mapping_zip():
     try:
-        # Path to the CSV file
-        csv_file_path = 'for_site/mapping.csv'
-
-        # Ensure the CSV file exists
-        if not os.path.isfile(csv_file_path):
-            return jsonify({"status": "error", "message": "CSV file not found."}), 404
-
-        # Create a ZIP file from the CSV file
-        zip_file_path = 'for_site/mapping.zip'
-        with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(csv_file_path, os.path.basename(csv_file_path))
-
-        # Send the ZIP file as a download
-        return send_file(zip_file_path, as_attachment=True, download_name=os.path.basename(zip_file_path),
-                         mimetype='application/zip')
+        mapping_format = request.values.get('format', 'csv')
+        if mapping_format not in MAPPING_FORMATS:
+            return jsonify({"status": "error", "message": f"Unknown mapping format: {mapping_format}"}), 400
+        # 'from' - distance from the first word to every word, 'to' - from every word to the first word
+        direction = request.values.get('direction', 'from')
+        if direction not in ('from', 'to'):
+            return jsonify({"status": "error", "message": f"Unknown mapping direction: {direction}"}), 400
+
+        # Mapping is built lazily from the session's cached optimization, only when downloaded
+        first_word_id = session.get('first_word_id')
+        if first_word_id is None:
+            first_word_id = get_id_by_name(full_nodes_path, request.values.get('startNode', ''))
+        if first_word_id is None:
+            return jsonify({"status": "error", "message": "No optimization to export."}), 404
+
+        weight = requested_weight()
+        cache = (reverse_path_caches if direction == 'to' else path_caches)[weight]
+        with stage('local_optimize_graph'):
+            all_paths = cache.get(first_word_id)
+        with stage('mapping_rows'):
+            rows = mapping_rows(all_paths.graph, all_paths)
+        chunks = stream_mapping(rows, mapping_format)
+        # The first chunk is produced here so that export errors are reported before streaming starts
+        first_chunk = next(chunks)
+
+        download_name, mimetype = MAPPING_FORMATS[mapping_format]
+        return Response(chain([first_chunk], chunks), mimetype=mimetype,
+                        headers={"Content-Disposition": f"attachment; filename={download_name}"})
 
     except Exception as e:
         error_message = str(e)
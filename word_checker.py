@@ -1,45 +1,94 @@
+import os
+import threading
 import pandas as pd
 
 
-def get_id_by_name(file_path, target_word):
-    # Зчитування CSV-файлу у DataFrame
+class Lexicon:
+    """
+    Індекс словника вершин: точні відповідності слово -> ID та ID -> слово / мітка.
+
+    Будується один раз для файлу і перебудовується лише тоді, коли змінюється час
+    модифікації файлу (mtime).
+    """
+
+    def __init__(self, file_path, mtime, df):
+        self.file_path = file_path
+        self.mtime = mtime
+        self.id_by_name = {}
+        self.name_by_id = {}
+        self.label_by_id = {}
+
+        ids = df['Id'].tolist()
+        names = df['Name'].tolist()
+        labels = df['Label'].tolist() if 'Label' in df.columns else [None] * len(ids)
+        for node_id, name, label in zip(ids, names, labels):
+            node_id = int(node_id)
+            # Перший збіг має пріоритет, як і при пошуку у DataFrame
+            if isinstance(name, str):
+                self.id_by_name.setdefault(name.strip(), node_id)
+            self.name_by_id.setdefault(node_id, name)
+            self.label_by_id.setdefault(node_id, label)
+
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+# Завантаження (або повторне використання) індексу словника для файлу вершин
+def load_lexicon(file_path):
     try:
-        df = pd.read_csv(file_path)
-    except FileNotFoundError:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
         print(f"Помилка: файл не знайдено - {file_path}")
         return None
 
-    # Перевірка на наявність колонок 'Name' і 'Id' у DataFrame
-    if 'Name' not in df.columns or 'Id' not in df.columns:
-        print("Помилка: DataFrame не містить необхідних колонок 'Name' або 'Id'")
-        return None
+    key = os.path.abspath(file_path)
+    lexicon = _lexicons.get(key)
+    if lexicon is not None and lexicon.mtime == mtime:
+        return lexicon
 
-    # Пошук точного збігу слова у колонці 'Name'
-    exact_match = df[df['Name'].str.strip() == target_word.strip()]
-    if not exact_match.empty:
-        # Повернення першого ID, де знайдений точний збіг
-        return exact_match.iloc[0]['Id']
-    return None
+    with _lexicons_lock:
+        lexicon = _lexicons.get(key)
+        if lexicon is None or lexicon.mtime != mtime:
+            try:
+                df = pd.read_csv(file_path)
+            except Exception as e:
+                print("Помилка при читанні CSV файлу:", e)
+                return None
 
-def get_name_by_id(file_path, target_id):
-    # Зчитування CSV-файлу у DataFrame
+            # Перевірка на наявність колонок 'Name' і 'Id' у DataFrame
+            if 'Name' not in df.columns or 'Id' not in df.columns:
+                print("Помилка: DataFrame не містить необхідних колонок 'Name' або 'Id'")
+                return None
+
+            lexicon = Lexicon(key, mtime, df)
+            _lexicons[key] = lexicon
+    return lexicon
+
+
+# Перетворення ID (int або str) у ключ індексу
+def _normalize_id(node_id):
     try:
-        df = pd.read_csv(file_path)
-    except FileNotFoundError:
-        print(f"Помилка: файл не знайдено - {file_path}")
+        return int(str(node_id).strip())
+    except ValueError:
         return None
 
-    # Перевірка на наявність колонок 'Id' та 'Name' у DataFrame
-    if 'Id' not in df.columns or 'Name' not in df.columns:
-        print("Помилка: DataFrame не містить необхідних колонок 'Id' або 'Name'")
+
+def get_id_by_name(file_path, target_word):
+    lexicon = load_lexicon(file_path)
+    if lexicon is None:
+        return None
+
+    # Пошук точного збігу слова у колонці 'Name'
+    return lexicon.id_by_name.get(target_word.strip())
+
+
+def get_name_by_id(file_path, target_id):
+    lexicon = load_lexicon(file_path)
+    if lexicon is None:
         return None
 
-    # Пошук рядка, де Id збігається з target_id
-    match = df[df['Id'] == target_id]
-    if not match.empty:
-        # Повернення першого значення Name, яке збігається
-        return match['Name'].iloc[0]
-    return None
+    return lexicon.name_by_id.get(_normalize_id(target_id))
 
 
 def get_label_by_id(file_path, node_id):
@@ -53,25 +102,11 @@ def get_label_by_id(file_path, node_id):
     Returns:
         str: The label associated with the given node ID, or None if not found.
     """
-    # Load the CSV file
-    try:
-        df = pd.read_csv(file_path)
-        print(f"CSV loaded successfully. Columns: {df.columns.tolist()}")
-    except Exception as e:
-        print("Failed to read the CSV file:", e)
+    lexicon = load_lexicon(file_path)
+    if lexicon is None:
         return None
 
-    # Ensure IDs are stripped of leading/trailing spaces
-    df['Id'] = df['Id'].astype(str).str.strip()
-    node_id = str(node_id).strip()
-
-    # Filter the DataFrame for the given node ID
-    result = df[df['Id'] == node_id]
-    print(f"Searching for ID: {node_id}. Result: {result}")
-
-    # Check if the node ID was found and return the label
-    if not result.empty:
-        return result.iloc[0]['Label']
-    else:
+    label = lexicon.label_by_id.get(_normalize_id(node_id))
+    if label is None:
         print(f"No label found for ID: {node_id}")
-        return None
+    return label
@@ -0,0 +1,21 @@
+from concurrent.futures import ProcessPoolExecutor
+from local_optimization import reset_optimizer_counters
+
+
+# Граф, переданий у процес-обробник пулу один раз під час його запуску
+_worker_graph = None
+
+
+def init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+    reset_optimizer_counters()
+
+
+def worker_graph():
+    return _worker_graph
+
+
+# Пул процесів, кожен з яких отримує граф один раз (а не з кожним завданням)
+def graph_process_pool(graph, max_workers):
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(graph,))